@@ -4,15 +4,20 @@ import logging
 from app.pages.auth import auth_bp
 from app.pages.admin import admin_bp
 from app.pages.error import error_bp
+from app.assets import assets_bp
 
 from app.database import db
+from app.database.purge import purge_command
+from app.database.sqlite import setup_sqlite
 
 from flask import Flask
 from flask.json.provider import DefaultJSONProvider
 
+import instrumentation
 from logger import configure_logger
 from settings import Config
 from extensions import cache, get_translate
+from sessions import CacheSessionInterface
 
 
 def check_required_env(required: list, logger=logging.getLogger()) -> bool:
@@ -28,7 +33,7 @@ def check_required_env(required: list, logger=logging.getLogger()) -> bool:
     
     if missing_vars:
         flat_missing_vars = [var if isinstance(var, str) else "/".join(var) for var in missing_vars]
-        logger.error(f'Required environment variables not set: {", ".join(flat_missing_vars)}')
+        logger.error('Required environment variables not set: %s', ", ".join(flat_missing_vars))
         return False
 
     return True
@@ -55,18 +60,30 @@ def create_app(config_class=Config):
 
         config_class.init_app(app)
         
-        configure_logger(app.logger)
+        configure_logger(
+            app.logger,
+            log_format=app.config.get('LOG_FORMAT', 'text'),
+            debug_sample_rate=app.config.get('LOG_DEBUG_SAMPLE_RATE', 1.0)
+        )
         
         app.json = CustomJSONProvider(app)
 
         db.init_app(app)
         cache.init_app(app)
 
+        # Данные сессии в кэше, в cookie только непрозрачный id
+        if app.config.get('SESSION_STORE') == 'cache':
+            app.session_interface = CacheSessionInterface()
+
         app.register_blueprint(auth_bp)
         app.register_blueprint(admin_bp)
         app.register_blueprint(error_bp)
+        app.register_blueprint(assets_bp)
+        app.cli.add_command(purge_command)
+        instrumentation.init_app(app)
 
         with app.app_context():
+            setup_sqlite(db.engine, app.config.get('DB'))
             db.create_all()
 
         # Добавляем контекстный процессор
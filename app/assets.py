@@ -0,0 +1,105 @@
+import json
+import mimetypes
+import os
+
+from flask import Blueprint, abort, current_app, make_response, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+DIST_FOLDER = 'dist'
+MANIFEST_FILE = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Бандлы в порядке подключения файлов; язык и иконка собираются как отдельные файлы
+BUNDLES = {
+    'base.css': ['style/main.css'],
+    'portal.css': ['style/buttons.css', 'style/forms.css', 'style/notifications.css', 'style/modals.css'],
+    'portal.js': ['javascript/phoneinput.js', 'javascript/modals.js'],
+    'error.css': ['style/buttons.css', 'style/notifications.css'],
+    'admin.css': [
+        'style/buttons.css',
+        'style/forms.css',
+        'style/tables.css',
+        'style/navigation.css',
+        'style/notifications.css',
+        'style/modals.css'
+    ],
+    'admin.js': ['javascript/localization.js', 'javascript/phoneinput.js', 'javascript/modals.js'],
+    'tables.js': ['javascript/tables.js'],
+}
+
+# Предсжатые варианты в порядке предпочтения
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+assets_bp = Blueprint('assets', __name__)
+
+
+def _get_manifest() -> dict | None:
+    manifest = current_app.extensions.get('assets_manifest')
+    if manifest is None:
+        path = os.path.join(current_app.static_folder, DIST_FOLDER, MANIFEST_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            # Сборка не запускалась - отдаем исходные файлы
+            manifest = {}
+        current_app.extensions['assets_manifest'] = manifest
+    # Без зарегистрированного маршрута собранные файлы отдать нечем
+    if not manifest or 'assets' not in current_app.blueprints:
+        return None
+    return manifest
+
+
+def asset_urls(name) -> list:
+    """
+    Return the URLs to include for a bundle or a single static file.
+
+    After `build_assets.py` this is one fingerprinted URL of the bundle, otherwise
+    the URLs of the source files the bundle is made of.
+
+    Args:
+        name (str): Bundle name from `BUNDLES` or a path inside `app/static`.
+
+    Example:
+        {% for url in asset_urls('portal.css') %}<link rel="stylesheet" href="{{ url }}">{% endfor %}
+    """
+    manifest = _get_manifest()
+    if manifest and name in manifest:
+        return [url_for('assets.asset', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in BUNDLES.get(name, [name])]
+
+
+def asset_url(name) -> str:
+    """Return the URL of a single static file, fingerprinted after the build."""
+    return asset_urls(name)[0]
+
+
+@assets_bp.route('/assets/<path:filename>', methods=['GET'])
+def asset(filename):
+    dist_folder = os.path.join(current_app.static_folder, DIST_FOLDER)
+    served, encoding = filename, None
+    for candidate, extension in ENCODINGS:
+        path = safe_join(dist_folder, filename + extension)
+        if request.accept_encodings[candidate] and path and os.path.isfile(path):
+            served, encoding = filename + extension, candidate
+            break
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accel_redirect = (current_app.config.get('ASSETS') or {}).get('accel_redirect')
+    if accel_redirect:
+        path = safe_join(dist_folder, served)
+        if not path or not os.path.isfile(path):
+            abort(404)
+        # Файл отдает nginx из internal location, приложение только выбирает вариант
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{accel_redirect.rstrip('/')}/{served}"
+        response.mimetype = mimetype
+    else:
+        # USE_X_SENDFILE передает файл веб-серверу через X-Sendfile
+        response = send_from_directory(dist_folder, served, mimetype=mimetype, conditional=True)
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
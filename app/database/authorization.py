@@ -0,0 +1,94 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.types import String
+
+from app.database import db
+from app.database.membership import get_membership_index
+from app.database.models import ClientsNumber, WifiClient
+
+
+@dataclass(frozen=True)
+class Authorization:
+    """
+    Snapshot of everything the captive portal needs to authorize a client.
+
+    Attributes:
+        mac (str): MAC address the lookup was made for.
+        phone (str): Phone number the flags were resolved for: the requested phone
+            or, if none was given, the phone bound to the MAC.
+        client_id (int): Primary key of the WifiClient row for the MAC, if any.
+        client_phone (str): Phone number bound to the WifiClient row, if any.
+        expiration (datetime): Expiration of the WifiClient row, if any.
+        client_employee (bool): Employee flag stored on the WifiClient row.
+        phone_id (int): Primary key of the ClientsNumber row for `phone`, if any.
+        blacklisted (bool): `phone` is in the blacklist.
+        employee (bool): `phone` belongs to an employee.
+    """
+    mac: Optional[str] = None
+    phone: Optional[str] = None
+    client_id: Optional[int] = None
+    client_phone: Optional[str] = None
+    expiration: Optional[datetime.datetime] = None
+    client_employee: Optional[bool] = None
+    phone_id: Optional[int] = None
+    blacklisted: bool = False
+    employee: bool = False
+
+    @property
+    def is_active(self) -> bool:
+        return self.expiration is not None and datetime.datetime.now() < self.expiration
+
+
+def resolve_authorization(mac=None, phone=None) -> Authorization:
+    """
+    Resolve client, phone, blacklist and employee state in a single round trip.
+
+    The lookup values are selected as a one-row derived table and everything else is
+    LEFT JOINed to it, so the query always returns exactly one row even when nothing
+    is known about the MAC or the phone yet. Blacklist and employee flags come from
+    the in-process membership index and cost no query at all.
+
+    Args:
+        mac (str): MAC address of the client device.
+        phone (str): Normalized phone number. If omitted, the phone bound to the MAC is used.
+    """
+    lookup = select(
+        literal(mac, String(17)).label('mac'),
+        literal(phone, String(20)).label('phone')
+    ).subquery('lookup')
+
+    client_phone = aliased(ClientsNumber)
+    phone_number = func.coalesce(lookup.c.phone, client_phone.phone_number)
+
+    stmt = (
+        select(
+            phone_number.label('phone'),
+            WifiClient.id.label('client_id'),
+            client_phone.phone_number.label('client_phone'),
+            WifiClient.expiration,
+            WifiClient.employee.label('client_employee'),
+            ClientsNumber.id.label('phone_id'),
+        )
+        .select_from(lookup)
+        .outerjoin(WifiClient, WifiClient.mac == lookup.c.mac)
+        .outerjoin(client_phone, client_phone.id == WifiClient.phone_id)
+        .outerjoin(ClientsNumber, ClientsNumber.phone_number == phone_number)
+    )
+    row = db.session.execute(stmt).one()
+    membership = get_membership_index()
+
+    return Authorization(
+        mac=mac,
+        phone=row.phone,
+        client_id=row.client_id,
+        client_phone=row.client_phone,
+        expiration=row.expiration,
+        client_employee=row.client_employee,
+        phone_id=row.phone_id,
+        blacklisted=row.phone is not None and membership.is_blacklisted(row.phone),
+        employee=row.phone is not None and membership.is_employee(row.phone),
+    )
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts wait for a free connection.
+
+    A steadily growing wait means the pool (`pool_size` + `max_overflow`) is too small for
+    the number of threads in the worker; see `pool_stats`.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            with self._wait_lock:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+    def recreate(self):
+        # dispose() пересоздает пул - счетчики продолжаются в новом
+        pool = super().recreate()
+        pool.checkouts, pool.wait_total, pool.wait_max = self.checkouts, self.wait_total, self.wait_max
+        return pool
+
+
+def engine_options(database_url, db_config) -> dict:
+    """
+    Build `SQLALCHEMY_ENGINE_OPTIONS` from the `db` settings for the database in the URL.
+
+    Pool options apply to server databases only; SQLite keeps Flask-SQLAlchemy's defaults.
+    Timeouts are passed in the form the driver understands: `connect_timeout` for both
+    PostgreSQL and MySQL, `statement_timeout` as a session option for PostgreSQL, as
+    `max_execution_time` (SELECT only) for MySQL and as `max_statement_time` for MariaDB.
+
+    Args:
+        database_url (str): SQLAlchemy database URL.
+        db_config (dict): The `DB` settings.
+
+    Example:
+        engine_options('postgresql://hotspot@db/hotspot', {'pool_size': 10, 'statement_timeout': 5000})
+    """
+    db_config = db_config or {}
+    backend = make_url(database_url).get_backend_name()
+    if backend == 'sqlite':
+        return {}
+
+    options = {'poolclass': TimedQueuePool, 'pool_pre_ping': db_config.get('pool_pre_ping', True)}
+    for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'isolation_level'):
+        if db_config.get(key) is not None:
+            options[key] = db_config[key]
+
+    connect_args = {}
+    if db_config.get('connect_timeout') is not None:
+        connect_args['connect_timeout'] = db_config['connect_timeout']
+    statement_timeout = db_config.get('statement_timeout')
+    if statement_timeout is not None:
+        if backend == 'postgresql':
+            connect_args['options'] = f'-c statement_timeout={int(statement_timeout)}'
+        elif backend == 'mysql':
+            connect_args['init_command'] = f'SET SESSION max_execution_time={int(statement_timeout)}'
+        elif backend == 'mariadb':
+            # В MariaDB нет max_execution_time, max_statement_time задается в секундах
+            connect_args['init_command'] = f'SET SESSION max_statement_time={int(statement_timeout) / 1000:g}'
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def pool_stats(engine) -> dict:
+    """Current pool usage and checkout wait statistics of the engine."""
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            checkouts=pool.checkouts,
+            wait_total=round(pool.wait_total, 6),
+            wait_avg=round(pool.wait_total / pool.checkouts, 6) if pool.checkouts else 0.0,
+            wait_max=round(pool.wait_max, 6),
+        )
+    return stats
@@ -0,0 +1,157 @@
+import csv
+import io
+import json
+
+from sqlalchemy import insert, select
+
+from app.database import db
+from app.database.membership import invalidate_membership
+from app.database.models import Blacklist, Employee, EmployeePhone
+from extensions import normalize_phone
+
+# Размер пачки для IN (...) и executemany
+BATCH_SIZE = 500
+
+
+def parse_records(content, import_format) -> list:
+    """
+    Parse an uploaded CSV or JSON document into a list of records.
+
+    Args:
+        content (str | bytes): Document content.
+        import_format (str): `csv` (with a header row) or `json` (a list of objects or phones).
+
+    Example:
+        parse_records('lastname,name,phones\nDoe,John,79990001111;79990002222', 'csv')
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if import_format == 'csv':
+        return list(csv.DictReader(io.StringIO(content)))
+    if import_format == 'json':
+        records = json.loads(content)
+        if not isinstance(records, list):
+            raise ValueError('JSON import must be a list')
+        return records
+    raise ValueError(f'Unknown import format {import_format}')
+
+
+def _phones(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.replace(',', ';').split(';')
+    return [phone for phone in (normalize_phone(str(item)) for item in value) if phone]
+
+
+def _valid_phone(phone) -> bool:
+    return 10 <= len(phone) <= 15
+
+
+def _existing(column, values) -> set:
+    """Which of the values are already stored, a single IN query per batch."""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), BATCH_SIZE):
+        found.update(db.session.scalars(select(column).where(column.in_(values[start:start + BATCH_SIZE]))))
+    return found
+
+
+def _insert_many(table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+
+def import_employees(records) -> dict:
+    """
+    Import employees with their phones in one transaction.
+
+    Every record needs `lastname`, `name` and `phones` (a list or a `;`-separated string,
+    `phone` is accepted too). Records with a missing name, an invalid phone or a phone that
+    is already taken, in the database or earlier in the same import, are skipped and reported.
+
+    Returns:
+        dict: `imported` count and `errors` as a list of `{'row', 'error', 'phone'}`.
+    """
+    errors = []
+    parsed = []
+    for row, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            errors.append({'row': row, 'error': 'invalid_record'})
+            continue
+        lastname = (record.get('lastname') or '').strip()
+        name = (record.get('name') or '').strip()
+        phones = _phones(record.get('phones', record.get('phone')))
+        if not lastname or not name:
+            errors.append({'row': row, 'error': 'missing_name'})
+        elif not phones:
+            errors.append({'row': row, 'error': 'missing_phone'})
+        elif invalid := next((phone for phone in phones if not _valid_phone(phone)), None):
+            errors.append({'row': row, 'error': 'invalid_phone', 'phone': invalid})
+        else:
+            parsed.append((row, lastname, name, list(dict.fromkeys(phones))))
+
+    taken = _existing(EmployeePhone.phone_number, {phone for *_, phones in parsed for phone in phones})
+    employees = []
+    for row, lastname, name, phones in parsed:
+        duplicate = next((phone for phone in phones if phone in taken), None)
+        if duplicate:
+            errors.append({'row': row, 'error': 'phone_exists', 'phone': duplicate})
+            continue
+        taken.update(phones)
+        employees.append((Employee(lastname=lastname, name=name), phones))
+
+    if employees:
+        # ORM вставляет сотрудников пачкой и возвращает их id одним запросом, где это поддерживается
+        db.session.add_all([employee for employee, _ in employees])
+        db.session.flush()
+        _insert_many(EmployeePhone, [
+            {'phone_number': phone, 'employee_id': employee.id}
+            for employee, phones in employees
+            for phone in phones
+        ])
+    db.session.commit()
+    if employees:
+        invalidate_membership()
+
+    return {'imported': len(employees), 'errors': sorted(errors, key=lambda error: error['row'])}
+
+
+def import_blacklist(records) -> dict:
+    """
+    Import blacklisted phones in one transaction.
+
+    Records are phone strings or objects with a `phone` field. Invalid phones and phones
+    already in the blacklist are skipped and reported.
+
+    Returns:
+        dict: `imported` count and `errors` as a list of `{'row', 'error', 'phone'}`.
+    """
+    errors = []
+    phones = {}
+    for row, record in enumerate(records, 1):
+        value = record.get('phone') if isinstance(record, dict) else record
+        phone = normalize_phone(str(value or ''))
+        if not _valid_phone(phone):
+            errors.append({'row': row, 'error': 'invalid_phone', 'phone': phone})
+        elif phone in phones:
+            errors.append({'row': row, 'error': 'phone_exists', 'phone': phone})
+        else:
+            phones[phone] = row
+
+    taken = _existing(Blacklist.phone_number, phones)
+    for phone in taken:
+        errors.append({'row': phones.pop(phone), 'error': 'phone_exists', 'phone': phone})
+
+    _insert_many(Blacklist, [{'phone_number': phone} for phone in phones])
+    db.session.commit()
+    if phones:
+        invalidate_membership()
+
+    return {'imported': len(phones), 'errors': sorted(errors, key=lambda error: error['row'])}
+
+
+IMPORTERS = {
+    'employee': import_employees,
+    'blacklist': import_blacklist,
+}
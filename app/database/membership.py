@@ -0,0 +1,97 @@
+import secrets
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.database import db
+from app.database.models import Blacklist, EmployeePhone
+from extensions import cache
+
+
+class MembershipIndex:
+    """
+    In-process index of blacklisted and employee phone numbers.
+
+    Both tables are small and change only through the admin panel, so every worker keeps
+    them as frozensets instead of querying the database on each auth request. Admin writes
+    call `invalidate()`, which stores a new version stamp in the shared cache. Workers compare
+    their stamp with the cached one at most once per `check_interval` seconds and rebuild
+    lazily when it differs.
+
+    Args:
+        check_interval (float): How often, in seconds, the shared version is checked.
+    """
+    VERSION_KEY = 'membership:version'
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._blacklist = frozenset()
+        self._employees = frozenset()
+
+    def is_blacklisted(self, phone_number) -> bool:
+        self._refresh()
+        return phone_number in self._blacklist
+
+    def is_employee(self, phone_number) -> bool:
+        self._refresh()
+        return phone_number in self._employees
+
+    def invalidate(self):
+        """Bump the shared version so every worker rebuilds on its next check."""
+        cache.set(self.VERSION_KEY, secrets.token_hex(8), timeout=0)
+        with self._lock:
+            self._version = None
+
+    def _is_fresh(self, now) -> bool:
+        return self._version is not None and now - self._checked_at < self.check_interval
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._is_fresh(now):
+            return
+
+        with self._lock:
+            if self._is_fresh(now):
+                return
+
+            version = cache.get(self.VERSION_KEY)
+            if version is None:
+                # Кэш пуст (первый запуск или перезапуск memcached) - публикуем свою версию
+                cache.add(self.VERSION_KEY, secrets.token_hex(8), timeout=0)
+                version = cache.get(self.VERSION_KEY)
+
+            # Версию читаем до перестроения: если админ изменит данные во время
+            # перестроения, следующая проверка увидит новую версию
+            if version is None or version != self._version:
+                self._blacklist = frozenset(db.session.scalars(select(Blacklist.phone_number)))
+                self._employees = frozenset(db.session.scalars(select(EmployeePhone.phone_number)))
+                self._version = version
+            self._checked_at = now
+
+
+def get_membership_index() -> MembershipIndex:
+    """Return the membership index of the current application, creating it on first use."""
+    index = current_app.extensions.get('membership')
+    if index is None:
+        index = current_app.extensions.setdefault(
+            'membership',
+            MembershipIndex(current_app.config.get('MEMBERSHIP_CHECK_INTERVAL', 1.0))
+        )
+    return index
+
+
+def is_blacklisted(phone_number) -> bool:
+    return get_membership_index().is_blacklisted(phone_number)
+
+
+def is_employee(phone_number) -> bool:
+    return get_membership_index().is_employee(phone_number)
+
+
+def invalidate_membership():
+    get_membership_index().invalidate()
@@ -0,0 +1,130 @@
+import datetime
+import logging
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, bindparam, func, inspect, insert, select, text, update
+)
+
+from app.database.models import ClientsNumber, EmployeePhone, WifiClient
+from app.database.search import make_search_key, setup_search_index
+
+BATCH_SIZE = 1000
+
+metadata = MetaData()
+
+schema_version = Table(
+    'schema_version', metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _add_column(connection, column):
+    table = column.table
+    existing = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    if column.name not in existing:
+        # Описание колонки в синтаксисе текущей СУБД, как в CREATE TABLE
+        spec = connection.dialect.ddl_compiler(connection.dialect, None).get_column_specification(column)
+        preparer = connection.dialect.identifier_preparer
+        connection.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {spec}'))
+
+
+def _create_index(connection, table, name):
+    index = next(index for index in table.indexes if index.name == name)
+    index.create(connection, checkfirst=True)
+
+
+def _wifi_client_search(connection, delays):
+    """Columns for the admin table: login time to sort by and the normalized search key."""
+    _add_column(connection, WifiClient.__table__.c.login_at)
+    _add_column(connection, WifiClient.__table__.c.search_key)
+
+    # Заполняем пачками в Python: разница дат и конкатенация строк по-разному пишутся в каждой СУБД
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(WifiClient.id, WifiClient.mac, WifiClient.expiration, WifiClient.employee,
+                   ClientsNumber.phone_number)
+            .outerjoin(ClientsNumber, WifiClient.phone_id == ClientsNumber.id)
+            .where(WifiClient.id > last_id, WifiClient.search_key.is_(None))
+            .order_by(WifiClient.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        connection.execute(
+            update(WifiClient.__table__)
+            .where(WifiClient.__table__.c.id == bindparam('row_id'))
+            .values(search_key=bindparam('row_search_key'), login_at=bindparam('row_login_at')),
+            [
+                {
+                    'row_id': row.id,
+                    'row_search_key': make_search_key(row.mac, row.phone_number),
+                    # Время входа не хранилось - восстанавливаем по сроку действия
+                    'row_login_at': row.expiration - delays.get('employee' if row.employee else 'guest',
+                                                                datetime.timedelta()) if row.expiration else None
+                }
+                for row in rows
+            ]
+        )
+
+    setup_search_index(connection)
+
+
+def _hot_path_indexes(connection, delays):
+    """Indexes for the portal lookups, the admin table and the purge job."""
+    for name in ('ix_wifi_client_expiration', 'ix_wifi_client_phone_id',
+                 'ix_wifi_client_login_at', 'ix_wifi_client_search_key'):
+        _create_index(connection, WifiClient.__table__, name)
+    _create_index(connection, EmployeePhone.__table__, 'ix_employee_phone_employee_id')
+
+
+# Новые миграции добавляются только в конец списка; каждая должна быть идемпотентной,
+# потому что свежая база уже создана create_all() по текущим моделям
+MIGRATIONS = [
+    (1, 'wifi_client login_at and search_key', _wifi_client_search),
+    (2, 'indexes for login, code and admin tables', _hot_path_indexes),
+]
+
+
+def current_version(connection) -> int:
+    return connection.execute(select(func.coalesce(func.max(schema_version.c.version), 0))).scalar()
+
+
+def upgrade(engine, delays=None) -> int:
+    """
+    Bring the database schema up to the latest version.
+
+    Each pending migration runs in its own transaction together with its `schema_version` row,
+    so an interrupted upgrade continues from the last applied one.
+
+    Args:
+        engine: SQLAlchemy engine of the database.
+        delays (dict): Access durations of `guest` and `employee`, used to backfill `login_at`.
+
+    Returns:
+        int: The schema version after the upgrade.
+
+    Example:
+        with app.app_context():
+            upgrade(db.engine, {user: params['delay'] for user, params in app.config['HOTSPOT_USERS'].items()})
+    """
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        version = current_version(connection)
+
+    for number, description, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            logging.info('Applying migration %s: %s', number, description)
+            migration(connection, delays or {})
+            connection.execute(
+                insert(schema_version).values(
+                    version=number, description=description, applied_at=datetime.datetime.now()
+                )
+            )
+        version = number
+    return version
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, ForeignKey
+from sqlalchemy import Column, ForeignKey, event
 from sqlalchemy.types import Boolean, Integer, String, DateTime
 
 from app.database import db
+from app.database.search import make_search_key, setup_search_index
 
 
 class ClientsNumber(db.Model):
@@ -13,15 +14,30 @@ class ClientsNumber(db.Model):
 class WifiClient(db.Model):
     id = Column(Integer, primary_key=True)
     mac = Column(String(17), unique=True)
-    expiration = Column(DateTime)
+    expiration = Column(DateTime, index=True)
     employee = Column(Boolean)
-    phone_id = Column(Integer, ForeignKey(ClientsNumber.id))
+    phone_id = Column(Integer, ForeignKey(ClientsNumber.id), index=True)
     phone = db.relationship(ClientsNumber, backref='phones')
+    # Время входа для сортировки в админке и нормализованные MAC и телефон для поиска
+    login_at = Column(DateTime, index=True)
+    search_key = Column(String(64), index=True)
+
+
+@event.listens_for(WifiClient, 'before_insert')
+@event.listens_for(WifiClient, 'before_update')
+def _fill_search_key(mapper, connection, target):
+    phone = target.phone.phone_number if target.phone else None
+    target.search_key = make_search_key(target.mac, phone)
+
+
+@event.listens_for(WifiClient.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    setup_search_index(connection)
 
 
 class EmployeePhone(db.Model):
     phone_number = Column(String(20), primary_key=True)
-    employee_id = Column(Integer, ForeignKey('employee.id'), nullable=False)
+    employee_id = Column(Integer, ForeignKey('employee.id'), nullable=False, index=True)
 
 
 class Employee(db.Model):
@@ -33,3 +49,15 @@ class Employee(db.Model):
 
 class Blacklist(db.Model):
     phone_number = Column(String(20), primary_key=True)
+
+
+class SmsOutbox(db.Model):
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String(20), nullable=False)
+    message = Column(String(255), nullable=False)
+    status = Column(String(10), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime)
+    error = Column(String(255))
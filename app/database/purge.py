@@ -0,0 +1,170 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, exists, or_, select
+
+from app.database import db
+from app.database.models import ClientsNumber, SmsOutbox, WifiClient
+from app.sms.outbox import FAILED, SENT
+
+
+def _parse_time(value) -> datetime.time:
+    return datetime.datetime.strptime(value.strip(), '%H:%M').time()
+
+
+def in_window(window, now=None) -> bool:
+    """
+    Check that the current time falls into the maintenance window.
+
+    Args:
+        window (str): `HH:MM-HH:MM`, may cross midnight. An empty window allows any time.
+        now (datetime): Time to check, the current time by default.
+
+    Example:
+        in_window('22:00-06:00', datetime.datetime(2024, 1, 1, 23, 30))  # True
+    """
+    if not window:
+        return True
+    start, end = (_parse_time(part) for part in window.split('-'))
+    current = (now or datetime.datetime.now()).time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+class Purger:
+    """
+    Delete wifi clients expired longer than `retention` ago and the phone numbers left without clients.
+
+    Rows are removed in small batches picked by primary key from the `expiration` index, each batch
+    in its own short transaction, so the portal's writes are never blocked for long. The delete
+    re-checks the conditions, so a client that logged in again between the select and the delete
+    is kept. With `archive_dir` every removed row is first written to a gzipped NDJSON file.
+    Delivered and failed SMS outbox rows are deleted after `outbox_retention` and never archived.
+
+    Args:
+        retention (timedelta): How long expired clients are kept.
+        outbox_retention (timedelta): How long sent and failed outbox messages are kept.
+        batch_size (int): Rows deleted per transaction.
+        pause (float): Seconds to sleep between batches.
+        window (str): `HH:MM-HH:MM` maintenance window, the run stops when it ends.
+        archive_dir (str): Directory for archive files, nothing is archived if not set.
+
+    Example:
+        Purger(datetime.timedelta(days=30), window='22:00-06:00').run()
+    """
+    def __init__(self, retention, outbox_retention=datetime.timedelta(days=1), batch_size=500, pause=0.1,
+                 window=None, archive_dir=None):
+        self.retention = retention
+        self.outbox_retention = outbox_retention
+        self.batch_size = batch_size
+        self.pause = pause
+        self.window = window
+        self.archive_dir = archive_dir
+
+    @classmethod
+    def from_config(cls, purge_config):
+        return cls(
+            purge_config.get('retention', datetime.timedelta(days=30)),
+            outbox_retention=purge_config.get('outbox_retention', datetime.timedelta(days=1)),
+            batch_size=purge_config.get('batch_size', 500),
+            pause=purge_config.get('pause', 0.1),
+            window=purge_config.get('window'),
+            archive_dir=purge_config.get('archive_dir'),
+        )
+
+    def run(self, now=None) -> dict:
+        """Run one purge and return how many rows were removed from each table."""
+        now = now or datetime.datetime.now()
+        cutoff = now - self.retention
+        report = {'wifi_client': 0, 'clients_number': 0, 'sms_outbox': 0, 'complete': False}
+        archive = self._open_archive(now)
+        try:
+            report['complete'] = (
+                self._purge(report, 'wifi_client', archive, *self._wifi_clients(cutoff))
+                and self._purge(report, 'clients_number', archive, *self._clients_numbers(cutoff))
+                and self._purge(report, 'sms_outbox', None, *self._sms_outbox(now - self.outbox_retention))
+            )
+        finally:
+            if archive:
+                archive.close()
+        logging.info(
+            'Purge removed %s wifi clients and %s phone numbers expired before %s, %s outbox messages%s',
+            report['wifi_client'], report['clients_number'], cutoff, report['sms_outbox'],
+            '' if report['complete'] else ', stopped at the end of the window'
+        )
+        return report
+
+    def _wifi_clients(self, cutoff):
+        condition = (WifiClient.expiration < cutoff,)
+        columns = (WifiClient.id, WifiClient.mac, ClientsNumber.phone_number.label('phone'),
+                   WifiClient.expiration, WifiClient.employee, WifiClient.login_at)
+        rows = select(*columns).outerjoin(ClientsNumber, WifiClient.phone_id == ClientsNumber.id)
+        return WifiClient, condition, rows
+
+    def _clients_numbers(self, cutoff):
+        # Номер без клиентов, который давно не входил; last_seen обновляется при каждом входе
+        condition = (
+            or_(ClientsNumber.last_seen < cutoff, ClientsNumber.last_seen.is_(None)),
+            ~exists().where(WifiClient.phone_id == ClientsNumber.id),
+        )
+        rows = select(ClientsNumber.id, ClientsNumber.phone_number.label('phone'), ClientsNumber.last_seen)
+        return ClientsNumber, condition, rows
+
+    def _sms_outbox(self, cutoff):
+        # Только завершенные сообщения: ожидающие отправки не трогаем при любом возрасте
+        condition = (SmsOutbox.status.in_((SENT, FAILED)), SmsOutbox.created_at < cutoff)
+        rows = select(SmsOutbox.id)
+        return SmsOutbox, condition, rows
+
+    def _purge(self, report, table_name, archive, model, condition, rows) -> bool:
+        last_id = 0
+        while in_window(self.window):
+            batch = db.session.execute(
+                rows.where(model.id > last_id, *condition).order_by(model.id).limit(self.batch_size)
+            ).mappings().all()
+            if not batch:
+                return True
+            ids = [row['id'] for row in batch]
+            last_id = ids[-1]
+            if archive:
+                self._archive(archive, table_name, batch)
+            result = db.session.execute(delete(model).where(model.id.in_(ids), *condition))
+            db.session.commit()
+            report[table_name] += result.rowcount
+            if len(batch) < self.batch_size:
+                return True
+            time.sleep(self.pause)
+        return False
+
+    def _open_archive(self, now):
+        if not self.archive_dir:
+            return None
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"purge-{now:%Y%m%dT%H%M%S}.ndjson.gz")
+        return gzip.open(path, 'at', encoding='utf-8')
+
+    @staticmethod
+    def _archive(archive, table_name, batch):
+        for row in batch:
+            archive.write(json.dumps({'table': table_name, **row}, ensure_ascii=False, default=str) + '\n')
+        # Архив должен лечь на диск до удаления строк
+        archive.flush()
+
+
+@click.command('purge')
+@with_appcontext
+def purge_command():
+    """Delete (and optionally archive) expired wifi clients and unused phone numbers."""
+    report = Purger.from_config(current_app.config.get('PURGE') or {}).run()
+    click.echo(
+        f"Removed {report['wifi_client']} wifi clients, {report['clients_number']} phone numbers "
+        f"and {report['sms_outbox']} outbox messages"
+    )
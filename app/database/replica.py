@@ -0,0 +1,84 @@
+import logging
+
+from flask import current_app, g
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.database import db
+from extensions import cache
+
+REPLICA_BIND = 'replica'
+LAG_CACHE_KEY = 'db:replica:lag'
+# Отметка в кэше, что реплика недоступна: None в кэше не отличить от промаха
+UNAVAILABLE = -1.0
+
+POSTGRES_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def measure_replica_lag(engine) -> float | None:
+    """
+    Ask the replica how many seconds it is behind the primary.
+
+    Returns:
+        float: Lag in seconds, 0 for databases without replication status,
+            None if the replica cannot be queried or replication is stopped.
+    """
+    try:
+        with engine.connect() as connection:
+            if engine.dialect.name == 'postgresql':
+                return float(connection.execute(POSTGRES_LAG).scalar() or 0)
+            if engine.dialect.name in ('mysql', 'mariadb'):
+                status = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+                if status is None:
+                    return 0.0
+                lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+                return None if lag is None else float(lag)
+            return 0.0
+    except DBAPIError as e:
+        logging.warning('Replica lag check failed: %s', e)
+        return None
+
+
+def replica_lag() -> float | None:
+    """Replica lag shared by all workers through the cache, measured at most once per `replica_lag_check`."""
+    lag = cache.get(LAG_CACHE_KEY)
+    if lag is None:
+        lag = measure_replica_lag(db.engines[REPLICA_BIND])
+        lag = UNAVAILABLE if lag is None else lag
+        db_config = current_app.config.get('DB') or {}
+        cache.set(LAG_CACHE_KEY, lag, timeout=db_config.get('replica_lag_check', 5))
+    return None if lag == UNAVAILABLE else lag
+
+
+def replica_available() -> bool:
+    if REPLICA_BIND not in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+        return False
+    lag = replica_lag()
+    max_lag = (current_app.config.get('DB') or {}).get('replica_max_lag', 10)
+    return lag is not None and lag <= max_lag
+
+
+def read_session():
+    """
+    Session for read-only reporting queries of the current request.
+
+    Returns a session on the `replica` bind while it is configured and not lagging behind
+    more than `replica_max_lag` seconds, otherwise the primary `db.session`. Reads that
+    must see the request's own writes, like the portal's auth path, use `db.session` directly.
+
+    Example:
+        rows = read_session().execute(select(Blacklist.phone_number)).all()
+    """
+    if '_read_session' not in g:
+        g._read_session = Session(db.engines[REPLICA_BIND]) if replica_available() else None
+    return g._read_session or db.session
+
+
+def close_read_session(exc=None):
+    read = g.pop('_read_session', None)
+    if read is not None:
+        read.close()
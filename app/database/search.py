@@ -0,0 +1,104 @@
+import logging
+import re
+
+from flask import current_app
+from sqlalchemy import Integer, false, text
+from sqlalchemy.exc import DBAPIError
+
+from app.database import db
+
+FTS_TABLE = 'wifi_client_search'
+# Триграммный индекс не ищет по строкам короче трех символов
+TRIGRAM_MIN_LENGTH = 3
+
+SQLITE_FTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    f"USING fts5(search_key, content='wifi_client', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON wifi_client BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON wifi_client BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) VALUES ('delete', old.id, old.search_key); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_key ON wifi_client BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) VALUES ('delete', old.id, old.search_key); "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+POSTGRES_TRIGRAM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_wifi_client_search_key_trgm ON wifi_client USING gin (search_key gin_trgm_ops)",
+]
+
+
+def normalize_search(value: str) -> str:
+    """Leave only the characters stored in the search key: hex digits of MACs and digits of phones."""
+    return re.sub(r'[^0-9a-f]', '', (value or '').lower())
+
+
+def make_search_key(mac, phone) -> str:
+    """
+    Build the normalized search key of a wifi client.
+
+    Example:
+        make_search_key('AA:BB:CC:00:11:22', '+7 (999) 123-45-67')  # 'aabbcc001122 79991234567'
+    """
+    return f"{normalize_search(mac)} {re.sub(r'[^0-9]', '', phone or '')}".strip()
+
+
+def setup_search_index(connection):
+    """
+    Create the trigram search index over `wifi_client.search_key` if the database supports it.
+
+    SQLite gets an FTS5 trigram table kept in sync by triggers, PostgreSQL a pg_trgm GIN index.
+    Other databases, or SQLite builds without FTS5, fall back to a plain LIKE on the key.
+    """
+    statements = {'sqlite': SQLITE_FTS, 'postgresql': POSTGRES_TRIGRAM}.get(connection.dialect.name)
+    if not statements:
+        return
+    try:
+        # Точка сохранения, чтобы ошибка не прервала всю транзакцию create_all в PostgreSQL
+        with connection.begin_nested():
+            for statement in statements:
+                connection.execute(text(statement))
+    except DBAPIError as e:
+        logging.warning('Search index is not available, falling back to LIKE: %s', e)
+
+
+def _has_fts(session) -> bool:
+    has_fts = current_app.extensions.get('wifi_client_fts')
+    if has_fts is None:
+        has_fts = session.get_bind().dialect.name == 'sqlite' and session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+        ).first() is not None
+        current_app.extensions['wifi_client_fts'] = has_fts
+    return has_fts
+
+
+def search_condition(column_id, column_key, query):
+    """
+    Build the WHERE clause matching wifi clients by a MAC or phone fragment.
+
+    Args:
+        column_id: Primary key column of the wifi clients.
+        column_key: The `search_key` column.
+        query (str): Text entered in the admin panel.
+
+    Returns:
+        The clause, or None if the query is empty.
+    """
+    if not query:
+        return None
+    needle = normalize_search(query)
+    if not needle:
+        # В MAC и телефонах нет таких символов
+        return false()
+    if len(needle) >= TRIGRAM_MIN_LENGTH and _has_fts(db.session):
+        # Фраза в кавычках - подстрока для триграммного токенизатора
+        match = (
+            text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :needle")
+            .bindparams(needle=f'"{needle}"')
+            .columns(rowid=Integer)
+        )
+        return column_id.in_(match)
+    # На PostgreSQL этот LIKE использует GIN-индекс pg_trgm
+    return column_key.like(f'%{needle}%')
@@ -0,0 +1,84 @@
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.database import db
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+# Прагмы режима wal: параллельное чтение во время записи и ожидание блокировки вместо ошибки
+WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+
+def sqlite_pragmas(db_config) -> dict:
+    """
+    Pragmas applied to every new SQLite connection for the configured `sqlite_mode`.
+
+    Args:
+        db_config (dict): The `DB` settings: `sqlite_mode`, `busy_timeout`, `mmap_size`, `cache_size`.
+
+    Example:
+        sqlite_pragmas({'sqlite_mode': 'wal', 'busy_timeout': 5000})
+    """
+    if (db_config or {}).get('sqlite_mode', 'off') == 'off':
+        return {}
+    return {
+        **WAL_PRAGMAS,
+        'busy_timeout': int(db_config.get('busy_timeout', 5000)),
+        'mmap_size': int(db_config.get('mmap_size', 256 * 1024 * 1024)),
+        # Отрицательное значение - размер в килобайтах, а не в страницах
+        'cache_size': -int(db_config.get('cache_size', 64 * 1024)),
+    }
+
+
+def setup_sqlite(engine, db_config):
+    """Apply the SQLite mode pragmas on connect; other databases are left as is."""
+    pragmas = sqlite_pragmas(db_config)
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def is_locked_error(error) -> bool:
+    return isinstance(error, OperationalError) and any(message in str(error.orig) for message in LOCKED_MESSAGES)
+
+
+def commit_with_retry(work, attempts=5, backoff=0.05):
+    """
+    Run `work()` and commit, retrying the whole unit when SQLite reports lock contention.
+
+    busy_timeout makes SQLite wait for the write lock, but a read transaction that has to be
+    upgraded to a write after another connection committed fails at once; such a unit of work
+    is rolled back and repeated with a jittered exponential backoff.
+
+    Args:
+        work (callable): Executes the statements of the transaction, its result is returned.
+        attempts (int): Attempts before the error is raised.
+        backoff (float): Delay in seconds before the first retry, doubled on each next one.
+
+    Example:
+        phone_id = commit_with_retry(lambda: _touch_client_number(authz, now_time))
+    """
+    for attempt in range(attempts):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if not is_locked_error(e) or attempt == attempts - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
@@ -0,0 +1,198 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional
+
+from flask import current_app
+
+from extensions import cache
+
+OK = 'ok'
+BAD = 'bad'
+EXHAUSTED = 'exhausted'
+EXPIRED = 'expired'
+
+
+def _same_code(entered, expected) -> bool:
+    # Сравниваем как числа, чтобы ведущие нули и пробелы не мешали
+    try:
+        return int(entered) == int(expected)
+    except (TypeError, ValueError):
+        return str(entered) == str(expected)
+
+
+class OTPRecord(NamedTuple):
+    code: str
+    attempts: int
+    resend_at: int
+
+
+class BaseOTPStore(ABC):
+    """
+    BaseOTPStore class for keeping one-time SMS codes, one record per session.
+
+    A record holds the code, the number of verification attempts and the time after which
+    the code may be sent again. `issue`, `get`, `verify` and `clear` are each a single round
+    trip to the cache, and `verify` increments the attempts atomically, so concurrent
+    wrong-code posts cannot bypass `max_attempts`.
+
+    Args:
+        backend: Cache backend (`extensions.cache.cache`) the records are stored in.
+        ttl (int): Seconds the code stays valid.
+        resend_delay (int): Seconds before the code may be sent again.
+        max_attempts (int): Verification attempts per code.
+
+    Example:
+        store = get_otp_store()
+        store.issue(session_id, '1234')
+        store.verify(session_id, '1234')  # 'ok'
+    """
+    def __init__(self, backend, ttl=300, resend_delay=60, max_attempts=3):
+        self.backend = backend
+        self.ttl = int(ttl)
+        self.resend_delay = int(resend_delay)
+        self.max_attempts = int(max_attempts)
+
+    def _key(self, session_id) -> str:
+        return f'{session_id}:sms:otp'
+
+    def _resend_at(self, resend_delay=None) -> int:
+        return int(time.time()) + (self.resend_delay if resend_delay is None else resend_delay)
+
+    def _outcome(self, record: Optional[OTPRecord], code) -> str:
+        if record is None:
+            return EXPIRED
+        # Попытки сверх лимита отклоняются даже с верным кодом
+        if record.attempts > self.max_attempts:
+            return EXHAUSTED
+        if _same_code(code, record.code):
+            return OK
+        return EXHAUSTED if record.attempts >= self.max_attempts else BAD
+
+    @abstractmethod
+    def issue(self, session_id, code, attempts=0, resend_delay=None):
+        """
+        Stores a new code for the session, replacing the previous one.
+
+        Args:
+            session_id (str): Session the code belongs to.
+            code (str): The code sent to the user.
+            attempts (int): Attempts already spent on the code.
+            resend_delay (int): Seconds before the code may be sent again, `resend_delay` by default.
+        """
+
+    @abstractmethod
+    def resend(self, session_id, resend_delay=None) -> bool:
+        """
+        Postpones the next resend of the session's current code.
+
+        The code, its spent attempts and its expiry stay as they are, so resending does not
+        extend the code's life.
+
+        Args:
+            session_id (str): Session the code belongs to.
+            resend_delay (int): Seconds before the code may be sent again, `resend_delay` by default.
+
+        Returns:
+            bool: False if there is no valid code to resend.
+        """
+
+    @abstractmethod
+    def get(self, session_id) -> Optional[OTPRecord]:
+        """Returns the session's record or None if there is no valid code."""
+
+    @abstractmethod
+    def _increment(self, session_id) -> Optional[OTPRecord]:
+        """Atomically increments the attempts and returns the updated record."""
+
+    def verify(self, session_id, code) -> str:
+        """
+        Spends one attempt and checks the code.
+
+        Returns:
+            str: 'ok', 'bad' (wrong code, attempts left), 'exhausted' or 'expired'.
+        """
+        return self._outcome(self._increment(session_id), code)
+
+    def clear(self, session_id):
+        self.backend.delete(self._key(session_id))
+
+
+class SimpleOTPStore(BaseOTPStore):
+    """
+    OTP store for process-local and file caches.
+
+    Atomicity is provided by a process-wide lock, which is exact for SimpleCache and
+    best effort for FileSystemCache shared by several processes. The record also keeps its
+    absolute expiry time, so rewriting it on each attempt does not extend the code's life.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def issue(self, session_id, code, attempts=0, resend_delay=None):
+        record = OTPRecord(str(code), attempts, self._resend_at(resend_delay))
+        self.backend.set(self._key(session_id), (*record, int(time.time()) + self.ttl), timeout=self.ttl)
+
+    def resend(self, session_id, resend_delay=None):
+        key = self._key(session_id)
+        with self._lock:
+            record = self.backend.get(key)
+            if not record:
+                return False
+            *record, expires_at = record
+            remaining = expires_at - int(time.time())
+            if remaining <= 0:
+                self.backend.delete(key)
+                return False
+            record = OTPRecord(*record)._replace(resend_at=self._resend_at(resend_delay))
+            self.backend.set(key, (*record, expires_at), timeout=remaining)
+        return True
+
+    def get(self, session_id):
+        record = self.backend.get(self._key(session_id))
+        return OTPRecord(*record[:3]) if record else None
+
+    def _increment(self, session_id):
+        key = self._key(session_id)
+        with self._lock:
+            record = self.backend.get(key)
+            if not record:
+                return None
+            *record, expires_at = record
+            # cachelib не умеет сохранять оставшееся время жизни - передаем остаток до expires_at
+            remaining = expires_at - int(time.time())
+            if remaining <= 0:
+                self.backend.delete(key)
+                return None
+            record = OTPRecord(*record)._replace(attempts=record[1] + 1)
+            self.backend.set(key, (*record, expires_at), timeout=remaining)
+        return record
+
+
+def get_otp_store() -> BaseOTPStore:
+    """Return the OTP store of the current application for the configured cache backend."""
+    store = current_app.extensions.get('otp_store')
+    if store is None or store.backend is not cache.cache:
+        # Импорт здесь, чтобы бэкенды подтягивались только при использовании
+        from app.otp.memcached import MemcachedOTPStore
+        from app.otp.redis import RedisOTPStore
+        from cachelib import MemcachedCache, RedisCache
+
+        backend = cache.cache
+        if isinstance(backend, RedisCache):
+            store_class = RedisOTPStore
+        elif isinstance(backend, MemcachedCache):
+            store_class = MemcachedOTPStore
+        else:
+            store_class = SimpleOTPStore
+
+        config = current_app.config
+        store = store_class(
+            backend,
+            ttl=config.get('OTP_TTL', 300),
+            resend_delay=config.get('OTP_RESEND_DELAY', 60),
+            max_attempts=config.get('OTP_MAX_ATTEMPTS', 3)
+        )
+        current_app.extensions['otp_store'] = store
+    return store
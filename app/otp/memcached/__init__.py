@@ -0,0 +1,61 @@
+from app.otp import BaseOTPStore, OTPRecord
+
+# Запись упакована в одно число, чтобы попытку считал атомарный incr memcached:
+# ((resend_at - EPOCH) * 10^4 + code) * 10^6 + attempts
+EPOCH = 1_700_000_000
+CODE_SPAN = 10 ** 4
+ATTEMPTS_SPAN = 10 ** 6
+
+
+class MemcachedOTPStore(BaseOTPStore):
+    """
+    OTP store packing each record into one memcached integer.
+
+    `verify` is a single `incr`, which is atomic on the server and keeps the record's TTL.
+    Codes must be numeric with at most four digits, as generated by the auth pages.
+    """
+    def _key(self, session_id):
+        return self.backend._normalize_key(super()._key(session_id))
+
+    @staticmethod
+    def _pack(code, attempts, resend_at) -> int:
+        code = int(code)
+        if not 0 <= code < CODE_SPAN:
+            raise ValueError('OTP code must have at most 4 digits')
+        return ((resend_at - EPOCH) * CODE_SPAN + code) * ATTEMPTS_SPAN + attempts
+
+    @staticmethod
+    def _unpack(value) -> OTPRecord | None:
+        if value is None:
+            return None
+        rest, attempts = divmod(int(value), ATTEMPTS_SPAN)
+        resend_at, code = divmod(rest, CODE_SPAN)
+        return OTPRecord(str(code).zfill(4), attempts, resend_at + EPOCH)
+
+    def issue(self, session_id, code, attempts=0, resend_delay=None):
+        value = self._pack(code, attempts, self._resend_at(resend_delay))
+        with self.backend._client_context() as client:
+            client.set(self._key(session_id), value, self.ttl)
+
+    def resend(self, session_id, resend_delay=None):
+        key = self._key(session_id)
+        with self.backend._client_context() as client:
+            record = self._unpack(client.get(key))
+            if record is None:
+                return False
+            # Сдвигаем resend_at тем же incr: set заново выставил бы полный TTL, а incr его сохраняет
+            shift = max(self._resend_at(resend_delay) - record.resend_at, 0)
+            return client.incr(key, shift * CODE_SPAN * ATTEMPTS_SPAN) is not None
+
+    def get(self, session_id):
+        with self.backend._client_context() as client:
+            return self._unpack(client.get(self._key(session_id)))
+
+    def _increment(self, session_id):
+        # incr несуществующего ключа возвращает None - код истек
+        with self.backend._client_context() as client:
+            return self._unpack(client.incr(self._key(session_id)))
+
+    def clear(self, session_id):
+        with self.backend._client_context() as client:
+            client.delete(self._key(session_id))
@@ -0,0 +1,63 @@
+from app.otp import BaseOTPStore, OTPRecord
+
+# Попытка увеличивается только у существующей записи, иначе HINCRBY создал бы пустой хэш без TTL
+VERIFY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+return redis.call('HMGET', KEYS[1], 'code', 'attempts', 'resend_at')
+"""
+
+
+# HSET существующего ключа сохраняет его TTL; истекший код не воскрешается
+RESEND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'resend_at', ARGV[1])
+return 1
+"""
+
+class RedisOTPStore(BaseOTPStore):
+    """
+    OTP store keeping each record in one Redis hash.
+
+    `issue` writes the hash and its TTL in a MULTI pipeline and `verify` increments the
+    attempts in a Lua script, so every operation is a single atomic round trip.
+    """
+    def __init__(self, backend, *args, **kwargs):
+        super().__init__(backend, *args, **kwargs)
+        self._client = backend._write_client
+        self._verify = self._client.register_script(VERIFY_SCRIPT)
+        self._resend = self._client.register_script(RESEND_SCRIPT)
+
+    def _key(self, session_id):
+        return self.backend._get_prefix() + super()._key(session_id)
+
+    @staticmethod
+    def _record(values):
+        if not values or values[0] is None:
+            return None
+        code, attempts, resend_at = (value.decode() if isinstance(value, bytes) else value for value in values)
+        return OTPRecord(code, int(attempts), int(resend_at))
+
+    def issue(self, session_id, code, attempts=0, resend_delay=None):
+        key = self._key(session_id)
+        pipe = self._client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping={'code': str(code), 'attempts': attempts, 'resend_at': self._resend_at(resend_delay)})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def resend(self, session_id, resend_delay=None):
+        return bool(self._resend(keys=[self._key(session_id)], args=[self._resend_at(resend_delay)]))
+
+    def get(self, session_id):
+        return self._record(self._client.hmget(self._key(session_id), 'code', 'attempts', 'resend_at'))
+
+    def _increment(self, session_id):
+        return self._record(self._verify(keys=[self._key(session_id)]))
+
+    def clear(self, session_id):
+        self._client.delete(self._key(session_id))
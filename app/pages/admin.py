@@ -1,26 +1,43 @@
+import csv
+import io
+import json
 import secrets
 import bcrypt
+import click
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime, timedelta
 from functools import wraps
+from itertools import groupby
 
 from flask import (
     Blueprint, abort, render_template, redirect, url_for,
-    session, request, current_app, jsonify
+    session, request, current_app, jsonify, Response, stream_with_context
 )
+from sqlalchemy import func, select
 
 import logger
+from app.assets import asset_url, asset_urls
 from app.database import db
+from app.database.engine import pool_stats
+from app.database.importer import IMPORTERS, parse_records
+from app.database.membership import invalidate_membership
 from app.database.models import ClientsNumber, WifiClient, Employee, EmployeePhone, Blacklist
+from app.database.replica import close_read_session, read_session
+from app.database.search import normalize_search, search_condition
 from extensions import cache, get_translate, normalize_phone
+from sessions import regenerate_session
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+admin_bp.add_app_template_global(asset_url)
+admin_bp.add_app_template_global(asset_urls)
+admin_bp.teardown_request(close_read_session)
 
 
 def login_required(f):
     """Декоратор для проверки авторизации."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        logger.debug(f'session data {[item for item in session.items()]}')
+        logger.debug('session data %s', logger.Lazy(_log_masked_session))
         if not session.get('is_authenticated'):
             logger.debug('User is not authenticated')
             return redirect(url_for('admin.login'), 302)
@@ -67,7 +84,7 @@ def auth():
     password = request.form.get('password')
     client_ip = request.remote_addr
     user_lang = request.form.get('language', current_app.config.get('LANGUAGE_DEFAULT'))  # Получаем язык из формы, по умолчанию 'en'
-    logger.debug(f'Start login by {username}')
+    logger.debug('Start login by %s', username)
     # Проверка блокировки
     lockout_until = cache.get("lockout_until")
     lockout_time = current_app.config.get('LOCKOUT_TIME', 0)  # Установить значение по умолчанию
@@ -86,13 +103,15 @@ def auth():
     ):
         _reset_login_attempts()
 
+        # Новый id сессии при входе: id, подброшенный до входа, не дает доступа (session fixation)
+        regenerate_session(session)
         session['is_authenticated'] = True
         # Сохраняем язык пользователя в кеш
         session['user_lang'] = user_lang if user_lang != 'auto' else None
         session.permanent = True  # Устанавливаем сессию как постоянную
         current_app.permanent_session_lifetime = timedelta(minutes=30)  # Время жизни сессии
         logger.info(get_translate('errors.admin.user_logged_in').format(username=username, client_ip=client_ip))
-        logger.debug(f'session data {_log_masked_session()}')
+        logger.debug('session data %s', logger.Lazy(_log_masked_session))
         return redirect(url_for('admin.panel'), 302)
 
     _handle_failed_login(username, client_ip)
@@ -164,6 +183,7 @@ def save_data(tabel_name):
                 db.session.add(new_phone)
             new_id = new_employee.id
         db.session.commit()
+        invalidate_membership()
     elif tabel_name == 'blacklist':
         if Blacklist.query.filter_by(phone_number=data['phone']).first():
             abort(400, description=get_translate('errors.admin.tables.phone_number_exists'))
@@ -173,6 +193,7 @@ def save_data(tabel_name):
         new_blacklist_entry = Blacklist(phone_number=phone_number)
         db.session.add(new_blacklist_entry)
         db.session.commit()
+        invalidate_membership()
     else:
         abort(404)
 
@@ -205,11 +226,13 @@ def delete_data(tabel_name):
             db.session.delete(phone)
         db.session.delete(employee)
         db.session.commit()
+        invalidate_membership()
     elif tabel_name == 'blacklist':
         blacklist_entry = Blacklist.query.filter_by(phone_number=data['phone']).first()
         if blacklist_entry:
             db.session.delete(blacklist_entry)
             db.session.commit()
+            invalidate_membership()
     else:
         abort(404)
 
@@ -259,6 +282,7 @@ def block():
     new_blacklist_entry = Blacklist(phone_number=phone_number)
     db.session.add(new_blacklist_entry)
     db.session.commit()
+    invalidate_membership()
 
     # Устанавливаем срок истечения равным началу отсчета времени
     wifi_client.expiration = datetime(1970, 1, 1)  # Unix epoch start
@@ -273,43 +297,60 @@ def get_tabel(tabel_name):
     search_query = request.args.get('search', '').lower()
     page = int(request.args.get('page', 1))
     rows_per_page = int(request.args.get('rows_per_page', 10))
+    # Только чтение: при наличии реплики запросы уходят на нее
+    reader = read_session()
 
     if tabel_name == 'wifi_clients':
-        query = WifiClient.query.join(ClientsNumber, WifiClient.phone_id == ClientsNumber.id)
-        if search_query:
-            query = query.filter(
-                WifiClient.mac.ilike(f'%{search_query}%') |
-                WifiClient.phone.has(ClientsNumber.phone_number.ilike(f'%{search_query}%'))
+        cursor = request.args.get('cursor')
+        condition = search_condition(WifiClient.id, WifiClient.search_key, search_query)
+
+        statement = (
+            select(
+                WifiClient.id,
+                WifiClient.mac,
+                WifiClient.expiration,
+                WifiClient.employee,
+                WifiClient.login_at,
+                ClientsNumber.phone_number
             )
-
-        employee_delay = current_app.config['HOTSPOT_USERS']['employee']['delay']
-        guest_delay = current_app.config['HOTSPOT_USERS']['guest']['delay']
-
-        # Сортируем по вычисляемому выражению
-        query = query.order_by(
-            db.desc(
-                WifiClient.expiration - db.case(
-                    (WifiClient.employee == True, employee_delay),
-                    else_=guest_delay
+            .join(ClientsNumber, WifiClient.phone_id == ClientsNumber.id)
+        )
+        if condition is not None:
+            statement = statement.where(condition)
+
+        total_rows = _count_wifi_clients(statement, search_query)
+
+        # Сортировка по индексу login_at; id делает порядок однозначным для курсора.
+        # Клиенты без login_at (до миграции) идут в конце; is_(None) вместо NULLS LAST, которого нет в MySQL
+        statement = statement.order_by(WifiClient.login_at.is_(None), WifiClient.login_at.desc(), WifiClient.id.desc())
+        if cursor:
+            login_at, client_id = _decode_cursor(cursor)
+            if login_at is None:
+                statement = statement.where(WifiClient.login_at.is_(None), WifiClient.id < client_id)
+            else:
+                statement = statement.where(
+                    (WifiClient.login_at < login_at) |
+                    ((WifiClient.login_at == login_at) & (WifiClient.id < client_id)) |
+                    WifiClient.login_at.is_(None)
                 )
-            )
-        )   
+        else:
+            statement = statement.offset((page - 1) * rows_per_page)
 
-        total_rows = query.count()
-        logger.debug(query.statement.compile())
-        clients = query.offset((page - 1) * rows_per_page).limit(rows_per_page).all()
+        logger.debug('%s', logger.Lazy(statement.compile))
+        clients = reader.execute(statement.limit(rows_per_page)).all()
 
         data = [
             {
                 'mac': client.mac,
                 'expiration': client.expiration,
                 'employee': client.employee,
-                'phone': client.phone.phone_number if client.phone else None
+                'phone': client.phone_number
             }
             for client in clients
         ]
+        next_cursor = _encode_cursor(clients[-1]) if len(clients) == rows_per_page else None
     elif tabel_name == 'employee':
-        query = Employee.query
+        query = reader.query(Employee)
 
         if search_query:
             query = query.filter(
@@ -331,7 +372,7 @@ def get_tabel(tabel_name):
         for emp in employees
     ]
     elif tabel_name == 'blacklist':
-        query = Blacklist.query
+        query = reader.query(Blacklist)
 
         if search_query:
             query = query.filter(Blacklist.phone_number.ilike(f'%{search_query}%'))
@@ -343,12 +384,189 @@ def get_tabel(tabel_name):
     else:
         abort(404)
 
-    return jsonify({
+    response = {
         'data': data,
         'total_rows': total_rows,
         'current_page': page,
         'rows_per_page': rows_per_page
-    })
+    }
+    if tabel_name == 'wifi_clients':
+        response['next_cursor'] = next_cursor
+    return jsonify(response)
+
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+@admin_bp.route('/export/<tabel_name>', methods=['GET'])
+@login_required
+def export_tabel(tabel_name):
+    """Потоковая выгрузка таблицы в CSV или NDJSON с постоянным расходом памяти."""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
+
+    if tabel_name == 'wifi_clients':
+        columns = ['mac', 'phone', 'expiration', 'employee', 'login_at']
+        rows = _stream_rows(
+            select(
+                WifiClient.mac,
+                ClientsNumber.phone_number.label('phone'),
+                WifiClient.expiration,
+                WifiClient.employee,
+                WifiClient.login_at
+            )
+            .outerjoin(ClientsNumber, WifiClient.phone_id == ClientsNumber.id)
+            .order_by(WifiClient.id)
+        )
+    elif tabel_name == 'employee':
+        columns = ['id', 'lastname', 'name', 'phones']
+        rows = _group_employee_phones(_stream_rows(
+            select(Employee.id, Employee.lastname, Employee.name, EmployeePhone.phone_number)
+            .outerjoin(EmployeePhone, EmployeePhone.employee_id == Employee.id)
+            .order_by(Employee.id)
+        ))
+    elif tabel_name == 'blacklist':
+        columns = ['phone']
+        rows = _stream_rows(select(Blacklist.phone_number.label('phone')).order_by(Blacklist.phone_number))
+    else:
+        abort(404)
+
+    writer = _write_csv if export_format == 'csv' else _write_ndjson
+    response = Response(stream_with_context(writer(columns, rows)), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={tabel_name}.{export_format}'
+    return response
+
+
+@admin_bp.route('/pool', methods=['GET'])
+@login_required
+def pool():
+    """Занятость пула соединений и время ожидания соединения в этом воркере."""
+    return jsonify(pool_stats(db.engine))
+
+
+@admin_bp.route('/import/<tabel_name>', methods=['POST'])
+@login_required
+def import_tabel(tabel_name):
+    """Массовая загрузка сотрудников или черного списка из CSV или JSON с отчетом по строкам."""
+    if tabel_name not in IMPORTERS:
+        abort(404)
+
+    upload = request.files.get('file')
+    if upload:
+        import_format = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+        content = upload.read()
+    else:
+        import_format = 'json' if request.is_json else 'csv'
+        content = request.get_data()
+
+    try:
+        records = parse_records(content, import_format)
+    except (ValueError, csv.Error) as e:
+        logger.warning('Import of %s rejected: %s', tabel_name, e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    report = IMPORTERS[tabel_name](records)
+    logger.info('Imported %s rows into %s, %s rejected', report['imported'], tabel_name, len(report['errors']))
+    return jsonify({'success': True, **report})
+
+
+@admin_bp.cli.command('import')
+@click.argument('tabel_name', type=click.Choice(list(IMPORTERS)))
+@click.argument('file', type=click.File('rb'))
+def import_command(tabel_name, file):
+    """Import employees or blacklist from a CSV or JSON FILE."""
+    import_format = 'json' if file.name.lower().endswith('.json') else 'csv'
+    try:
+        records = parse_records(file.read(), import_format)
+    except (ValueError, csv.Error) as e:
+        raise click.ClickException(str(e))
+
+    report = IMPORTERS[tabel_name](records)
+    for error in report['errors']:
+        click.echo(f"row {error['row']}: {error['error']} {error.get('phone', '')}".rstrip(), err=True)
+    click.echo(f"Imported {report['imported']} rows, {len(report['errors'])} rejected")
+
+
+def _stream_rows(statement):
+    """Строки результата пачками по EXPORT_BATCH_SIZE через серверный курсор."""
+    result = read_session().execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for row in result:
+        yield row._mapping
+
+
+def _group_employee_phones(rows):
+    # Строки отсортированы по id, поэтому телефоны одного сотрудника идут подряд
+    for _, group in groupby(rows, key=lambda row: row['id']):
+        group = list(group)
+        first = group[0]
+        yield {
+            'id': first['id'],
+            'lastname': first['lastname'],
+            'name': first['name'],
+            'phones': [row['phone_number'] for row in group if row['phone_number']]
+        }
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _write_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for number, row in enumerate(rows, 1):
+        writer.writerow([
+            ';'.join(value) if isinstance(value, list) else _export_value(value)
+            for value in (row[column] for column in columns)
+        ])
+        # Отдаем клиенту накопленный кусок, а не каждую строку отдельно
+        if number % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _write_ndjson(columns, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps({column: _export_value(row[column]) for column in columns}, ensure_ascii=False))
+        if len(chunk) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def _count_wifi_clients(statement, search_query):
+    """Число клиентов для пагинации, кэшируется на ADMIN_COUNT_CACHE_TTL секунд."""
+    cache_key = f'admin:wifi_clients:count:{normalize_search(search_query)}'
+    total_rows = cache.get(cache_key)
+    if total_rows is None:
+        total_rows = read_session().scalar(select(func.count()).select_from(statement.subquery()))
+        cache.set(cache_key, total_rows, timeout=current_app.config.get('ADMIN_COUNT_CACHE_TTL', 30))
+    return total_rows
+
+
+def _encode_cursor(client):
+    login_at = client.login_at.isoformat() if client.login_at else None
+    return urlsafe_b64encode(json.dumps([login_at, client.id]).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        login_at, client_id = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(login_at) if login_at else None), int(client_id)
+    except (ValueError, TypeError):
+        abort(400)
 
 
 # Вспомогательные функции для повышения читаемости и повторного использования
@@ -4,11 +4,12 @@ import datetime
 from hashlib import md5, sha256
 from random import randint
 import secrets
+import time
 
 # Importing Blueprint for creating Flask blueprints
 from flask import Blueprint, jsonify
 
-from sqlalchemy import select
+from sqlalchemy import insert, update
 from sqlalchemy.exc import IntegrityError
 
 # Importing functions for rendering templates, redirecting, generating URLs, and aborting requests
@@ -26,20 +27,40 @@ from flask import (
     current_app
 )
 
+import instrumentation
 import logger
+from app import otp
+from app.assets import asset_url, asset_urls
 from app.database import db
-from app.database.models import Blacklist, ClientsNumber, EmployeePhone, WifiClient
-from extensions import get_translate, cache, normalize_phone
+from app.database.authorization import Authorization, resolve_authorization
+from app.database import membership
+from app.database.models import ClientsNumber, WifiClient
+from app.database.search import make_search_key
+from app.database.sqlite import commit_with_retry
+from app.otp import get_otp_store
+from app.sms.outbox import enqueue_sms, get_sms_status
+from extensions import get_translate, cache, normalize_phone, render_cached
 
 auth_bp = Blueprint('auth', __name__)
+auth_bp.add_app_template_global(asset_url)
+auth_bp.add_app_template_global(asset_urls)
+
+# Байты CHAP от MikroTik: '0'..'7', '00'..'77' и '000'..'377' -> значение
+OCTAL_BYTES = {f'{value:0{width}o}': value for width in (1, 2, 3) for value in range(min(8 ** width, 256))}
 
 
 def _octal_string_to_bytes(oct_string):
     if not oct_string:
         return b''
-    # Split the octal string by backslash and process each part
+    parts = oct_string.split("\\")[1:]
+    try:
+        return bytes(map(OCTAL_BYTES.__getitem__, parts))
+    except KeyError:
+        pass
+
+    # Нестандартные части (пустые, длинные, с цифрами 8 и 9) - поразрядно, как раньше
     byte_nums = []
-    for octal_num in oct_string.split("\\")[1:]:
+    for octal_num in parts:
         decimal_value = 0
         # Convert each octal digit to decimal and sum up the values
         for i in range(len(octal_num)):
@@ -49,10 +70,19 @@ def _octal_string_to_bytes(oct_string):
     return bytes(byte_nums)
 
 
+def _chap_password(chap_id, chap_challenge, password) -> str:
+    """CHAP response MikroTik expects: md5 of the id, the password and the challenge."""
+    return md5(_octal_string_to_bytes(chap_id) + password.encode() + _octal_string_to_bytes(chap_challenge)).hexdigest()
+
+
+def _user_fingerprint(hardware_fp, phone_number) -> str:
+    """Fingerprint of the device and phone pair the MAC is cached under."""
+    return sha256(f"{hardware_fp}:{phone_number}".encode()).hexdigest()
+
+
 def _check_employee(phone_number):
-    # Проверка наличия номера телефона в базе данных сотрудников
-    employee_phone = EmployeePhone.query.filter_by(phone_number=phone_number).first()
-    return employee_phone is not None
+    # Проверка наличия номера телефона среди номеров сотрудников
+    return membership.is_employee(phone_number)
 
 
 def _get_today() -> datetime.datetime:
@@ -67,8 +97,8 @@ def _mask_phone(phone: str) -> str:
 
 
 def _mask_mac(mac: str) -> str:
-    parts = mac.split(':')
-    return 'XX:XX:XX:' + ':'.join(parts[3:])
+    parts = mac.split(':', 3)
+    return 'XX:XX:XX:' + (parts[3] if len(parts) == 4 else '')
 
 
 def _log_masked_session():
@@ -120,7 +150,8 @@ def sendin():
     if not phone_number:
         abort(400)
 
-    is_employee = _check_employee(phone_number)
+    authz = resolve_authorization(phone=phone_number)
+    is_employee = authz.employee
 
     username = 'employee' if is_employee else 'guest'
     password = current_app.config['HOTSPOT_USERS'][username].get('password')
@@ -135,29 +166,25 @@ def sendin():
     
     # use HTTP CHAP method in hotspot
     if chap_id and chap_challenge:
-        chap_id = _octal_string_to_bytes(chap_id)
-        chap_challenge = _octal_string_to_bytes(chap_challenge)
         link_login_only = link_login_only.replace('https', 'http')
-        password = md5(chap_id + password.encode() + chap_challenge).hexdigest()
+        password = _chap_password(chap_id, chap_challenge, password)
 
     if user_fp := session.get('user_fp'):
         mac = session.get('mac')
         users_config = current_app.config['HOTSPOT_USERS']
         hotspot_user = users_config['employee'] if is_employee else users_config['guest']
         delay: datetime.timedelta = hotspot_user.get('delay')
-        logger.debug(f"Caching user_fp: {user_fp[:12]} delay {delay}")
+        logger.debug("Caching user_fp: %.12s delay %s", user_fp, delay)
         cache.set(f"fingerprint:{user_fp}", mac, timeout=delay.total_seconds())
     
     now_time = datetime.datetime.now()
-    db_phone = _get_or_create_client(phone_number)
-    # Обновляем поле last_seen, если запись уже существует
+    # Обновляем поле last_seen или создаем запись номера
     try:
-        db_phone.last_seen = now_time
-        db.session.commit()
-        logger.debug(f"Update time {now_time} for number {_mask_phone(phone_number)}")
+        commit_with_retry(lambda: _touch_client_number(authz, now_time))
+        logger.debug("Update time %s for number %s", now_time, logger.Lazy(_mask_phone, phone_number))
     except IntegrityError:
         db.session.rollback()
-        logger.error("Failed to update last_seen for phone number: %s", _mask_phone(phone_number))
+        logger.error("Failed to update last_seen for phone number: %s", logger.Lazy(_mask_phone, phone_number))
 
     session.clear()
     session['link-orig'] = link_orig
@@ -181,7 +208,7 @@ def test_login():
         abort(400)
     else:
         [session.update({k: v}) for k, v in request.values.items()]
-        logger.debug(f'Session data in test: {_log_masked_session()}')
+        logger.debug('Session data in test: %s', logger.Lazy(_log_masked_session))
     return login()
 
 
@@ -193,72 +220,72 @@ def login():
     has_form = all(key in set(request.form.keys()) for key in required_keys)
     has_session = all(key in set(session.keys()) for key in required_keys)
 
-    logger.debug(f'Session data before form: {_log_masked_session()}')
+    logger.debug('Session data before form: %s', logger.Lazy(_log_masked_session))
 
     if not has_form and not has_session:
         abort(400)
     else:
         [session.update({k: v}) for k, v in request.values.items()]
 
-    logger.debug(f'Session data after form: {_log_masked_session()}')
+    logger.debug('Session data after form: %s', logger.Lazy(_log_masked_session))
     mac = session.get('mac')
 
-    db_client = WifiClient.query.filter_by(mac=mac).first()
-    if db_client and datetime.datetime.now() < db_client.expiration:
-        phone = db_client.phone
-        if not phone:
+    authz = resolve_authorization(mac=mac)
+    if authz.is_active:
+        if not authz.client_phone:
             abort(500)
 
-        if Blacklist.query.filter_by(phone_number=phone.phone_number).first():
+        if authz.blacklisted:
             abort(403)
         
-        if _check_employee(phone.phone_number) == db_client.employee:
-            session['phone'] = phone.phone_number
+        if authz.employee == authz.client_employee:
+            session['phone'] = authz.client_phone
             if hardware_fp := session.get('hardware_fp'):
-                user_fp = sha256(f"{hardware_fp}:{phone.phone_number}".encode()).hexdigest()
+                user_fp = _user_fingerprint(hardware_fp, authz.client_phone)
                 session['user_fp'] = user_fp
-            logger.debug(f"Auth by expiration")
+            logger.debug("Auth by expiration")
             redirect_url = url_for('auth.sendin')
             return redirect(redirect_url, 302)
 
-    return render_template('auth/login.html', error=error)
+    return render_cached('auth/login.html', error=error)
 
 
 @auth_bp.route('/code', methods=['POST', 'GET'])
 def code():
     error = session.pop('error', None)
-    logger.debug(f'Session data before code: {_log_masked_session()}')
+    logger.debug('Session data before code: %s', logger.Lazy(_log_masked_session))
     phone_number = request.form.get('phone')
 
     if phone_number:
         phone_number = normalize_phone(phone_number)
 
-        if Blacklist.query.filter_by(phone_number=phone_number).first():
+        mac = session.get('mac')
+        authz = resolve_authorization(mac=mac, phone=phone_number)
+
+        if authz.blacklisted:
             abort(403)
 
         session['phone'] = phone_number
 
-        mac = session.get('mac')
-        logger.debug(f'User mac: {_mask_mac(mac)}')
         if not mac:
             abort(400)
+        logger.debug('User mac: %s', logger.Lazy(_mask_mac, mac))
 
-        db_client = WifiClient.query.filter_by(mac=mac).first()
         auth_method = "mac&phone"
 
         user_fp = None
         if hardware_fp := session.get('hardware_fp'):
-            user_fp = sha256(f"{hardware_fp}:{phone_number}".encode()).hexdigest()
+            user_fp = _user_fingerprint(hardware_fp, phone_number)
             session['user_fp'] = user_fp
         
-        if not db_client and user_fp:
+        if authz.client_id is None and user_fp:
             if fp_mac := cache.get(f"fingerprint:{user_fp}"):
-                db_client = WifiClient.query.filter_by(mac=fp_mac).first()
+                authz = resolve_authorization(mac=fp_mac, phone=phone_number)
                 session['mac'] = fp_mac
                 auth_method = "fingerprint&phone"
 
-        if db_client and db_client.phone and db_client.phone.phone_number == phone_number:
-            is_employee = _check_employee(phone_number)
+        if authz.client_id is not None and authz.client_phone == phone_number:
+            is_employee = authz.employee
 
             users_config = current_app.config['HOTSPOT_USERS']
 
@@ -269,107 +296,148 @@ def code():
             if expire_time < datetime.datetime.now():
                 expire_time += datetime.timedelta(days=1)
 
-            db_client.expiration = expire_time
-            db_client.employee = is_employee
-            db.session.commit()
+            commit_with_retry(lambda: db.session.execute(
+                update(WifiClient)
+                .where(WifiClient.id == authz.client_id)
+                .values(expiration=expire_time, employee=is_employee, login_at=datetime.datetime.now())
+            ))
             redirect_url = url_for('auth.sendin')
-            logger.debug(f"Auth by {auth_method}")
+            logger.debug("Auth by %s", auth_method)
             return redirect(redirect_url, 302)
 
     # Ensure phone_number is retrieved from session if not provided in the request
     if not phone_number:
         phone_number = session.get('phone')
-        logger.debug(f'User phone: {_mask_phone(phone_number)}')
+        logger.debug('User phone: %s', logger.Lazy(_mask_phone, phone_number))
         if not phone_number:
             abort(400)
 
     session_id = session.get('_id')
-    if not cache.get(f'{session_id}:sms:code'):
+    otp_store = get_otp_store()
+    if _get_otp(otp_store, session_id) is None:
         gen_code = str(randint(0, 9999)).zfill(4)
-        cache.set(f'{session_id}:sms:code', gen_code, timeout=5 * 60)
-        cache.set(f'{session_id}:sms:attempts', 0, timeout=5 * 60)
-        cache.set(f'{session_id}:sms:sended', True, timeout=60)
+        instrumentation.timed_cache(otp_store.issue, session_id, gen_code)
 
-        sender = current_app.config.get('SENDER')
-        sms_error = sender.send_sms(phone_number, get_translate('sms_code').format(code=gen_code))
+        sms_error = _send_code_sms(phone_number, gen_code)
 
         if sms_error:
-            logger.error(f"Failed to send SMS to {_mask_phone(phone_number)}")
+            logger.error("Failed to send SMS to %s", logger.Lazy(_mask_phone, phone_number))
             abort(500)
 
-        logger.debug(f"{_mask_phone(phone_number)}'s code: {gen_code}")
+        logger.debug("%s's code: %s", logger.Lazy(_mask_phone, phone_number), gen_code)
 
-    return render_template('auth/code.html', error=error)
+    return render_cached('auth/code.html', error=error)
 
 
 @auth_bp.route('/resend', methods=['POST'])
 def resend():
     phone_number = session.get('phone')
-    logger.debug(f'Session data before code: {_log_masked_session()}')
+    logger.debug('Session data before code: %s', logger.Lazy(_log_masked_session))
     if not phone_number:
         abort(400)
     
     session_id = session.get('_id')
-    if cache.get(f'{session_id}:sms:sended'):
+    otp_store = get_otp_store()
+    record = _get_otp(otp_store, session_id)
+    if record and record.resend_at > time.time():
         abort(400, description=get_translate('errors.auth.code_alredy_sended'))
 
-    user_code = cache.get(f'{session_id}:sms:code')
-    logger.debug(f'User cached code for {_mask_phone(phone_number)}: {user_code}')
+    logger.debug('User cached code for %s: %s', logger.Lazy(_mask_phone, phone_number), record and record.code)
 
-    if not user_code:
-        resend_code = str(randint(0, 9999)).zfill(4)
-        cache.set(f'{session_id}:sms:code', resend_code, timeout=5 * 60)
+    if record and instrumentation.timed_cache(otp_store.resend, session_id):
+        # Тот же код: потраченные попытки и срок действия сохраняются
+        resend_code = record.code
     else:
-        resend_code = user_code
-    cache.set(f'{session_id}:sms:sended', True, timeout=60)
+        resend_code = str(randint(0, 9999)).zfill(4)
+        instrumentation.timed_cache(otp_store.issue, session_id, resend_code)
 
-    sender = current_app.config.get('SENDER')
-    sms_error = sender.send_sms(phone_number, get_translate('sms_code').format(code=resend_code))
+    sms_error = _send_code_sms(phone_number, resend_code)
     if sms_error:
         abort(500)
 
-    logger.debug(f"Resend {_mask_phone(phone_number)}'s code: {resend_code}")
+    logger.debug("Resend %s's code: %s", logger.Lazy(_mask_phone, phone_number), resend_code)
 
     return jsonify({'success': True})
 
 
-def _get_or_create_client(phone_number):
-    """Получить или создать запись клиента по номеру телефона."""
-    now_time = datetime.datetime.now()
-    db_phone = ClientsNumber.query.filter_by(phone_number=phone_number).first()
-    if not db_phone:
-        try:
-            db_phone = ClientsNumber(phone_number=phone_number, last_seen=now_time)
-            db.session.add(db_phone)
-            db.session.commit()
-            logger.debug(f"Create new number {_mask_phone(phone_number)} by time {now_time}")
-        except IntegrityError:
-            db.session.rollback()
-            db_phone = ClientsNumber.query.filter_by(phone_number=phone_number).first()
-    return db_phone
+@auth_bp.route('/code/status', methods=['GET'])
+def code_status():
+    """Статус доставки последнего SMS с кодом для опроса со страницы ввода кода."""
+    sms_id = session.get('sms_id')
+    if sms_id is None:
+        # Очередь выключена - SMS уже отправлено синхронно
+        return jsonify({'success': True, 'status': 'sent'})
+    return jsonify({'success': True, 'status': get_sms_status(sms_id) or 'unknown'})
 
 
-def _create_or_udpate_wifi_client(mac, expiration, is_employee, db_phone):
-    """Создать запись WiFi клиента по MAC-адресу, если нету."""
-    db_client = db.session.execute(
-        select(WifiClient).where(WifiClient.mac == mac).with_for_update()
-    ).scalar_one_or_none()
+def _get_otp(otp_store, session_id):
+    record = instrumentation.timed_cache(otp_store.get, session_id)
+    instrumentation.observe_cache(session_id, record is not None, namespace='sms')
+    return record
 
-    if not db_client:
-        try:
-            db_client = WifiClient(mac=mac, expiration=expiration, employee=is_employee, phone=db_phone)
-            db.session.add(db_client)
-            db.session.commit()
-        except IntegrityError:
-            db.session.rollback()
+
+def _send_code_sms(phone_number, sms_code):
+    """Отправить SMS с кодом через очередь, если она включена, иначе синхронно. Возвращает признак ошибки."""
+    message = get_translate('sms_code').format(code=sms_code)
+    if (current_app.config.get('SMS_OUTBOX') or {}).get('enabled'):
+        session['sms_id'] = enqueue_sms(phone_number, message)
+        return False
+
+    sender = current_app.config.get('SENDER')
+    return bool(instrumentation.timed_send(sender, phone_number, message))
+
+
+def _touch_client_number(authz: Authorization, now_time):
+    """Обновить last_seen номера телефона или создать запись, если ее нет. Возвращает id номера."""
+    if authz.phone_id is None:
+        result = db.session.execute(
+            insert(ClientsNumber).values(phone_number=authz.phone, last_seen=now_time)
+        )
+        logger.debug("Create new number %s by time %s", logger.Lazy(_mask_phone, authz.phone), now_time)
+        return result.inserted_primary_key[0]
+
+    db.session.execute(
+        update(ClientsNumber)
+        .where(ClientsNumber.id == authz.phone_id)
+        .values(last_seen=now_time)
+    )
+    return authz.phone_id
+
+
+def _write_wifi_client(authz: Authorization, expiration, is_employee):
+    if authz.phone_id is None:
+        phone_id = _touch_client_number(authz, datetime.datetime.now())
+    else:
+        phone_id = authz.phone_id
+
+    values = {
+        'expiration': expiration,
+        'employee': is_employee,
+        'phone_id': phone_id,
+        'login_at': datetime.datetime.now(),
+        'search_key': make_search_key(authz.mac, authz.phone)
+    }
+    if authz.client_id is None:
+        db.session.execute(insert(WifiClient).values(mac=authz.mac, **values))
     else:
+        db.session.execute(
+            update(WifiClient)
+            .where(WifiClient.id == authz.client_id)
+            .values(**values)
+        )
+
+
+def _save_wifi_client(authz: Authorization, expiration, is_employee):
+    """Создать или обновить записи номера и WiFi клиента одной транзакцией."""
+    for _ in range(2):
         try:
-            db_client.expiration = expiration
-            db_client.employee = is_employee
-            db_client.phone = db_phone
-            db.session.commit()
+            commit_with_retry(lambda: _write_wifi_client(authz, expiration, is_employee))
+            return
         except IntegrityError:
+            # Параллельный запрос успел создать запись - перечитываем и обновляем
             db.session.rollback()
+            authz = resolve_authorization(mac=authz.mac, phone=authz.phone)
+    logger.error("Failed to save wifi client for %s", logger.Lazy(_mask_phone, authz.phone))
 
 
 @auth_bp.route('/auth', methods=['POST'])
@@ -381,23 +449,25 @@ def auth():
 
     session_id = session.get('_id')
     form_code = request.form.get('code')
-    user_code = cache.get(f'{session_id}:sms:code')
 
     if form_code is None:
         session['error'] = get_translate('errors.auth.missing_code')
         return redirect(url_for('auth.code'), 302)
-    if user_code is None:
+
+    otp_store = get_otp_store()
+    result = instrumentation.timed_cache(otp_store.verify, session_id, form_code)
+    instrumentation.observe_otp(result)
+
+    if result == otp.EXPIRED:
         session['error'] = get_translate('errors.auth.expired_code')
         return redirect(url_for('auth.code'), 302)
 
-    if int(form_code) == int(user_code):
+    if result == otp.OK:
         today_start = _get_today()
 
-        # Получение или создание записи клиента
-        db_phone = _get_or_create_client(phone_number)
-
-        # Проверка, является ли пользователь сотрудником
-        is_employee = _check_employee(phone_number)
+        # Номер, клиент и признак сотрудника одним запросом
+        authz = resolve_authorization(mac=mac, phone=phone_number)
+        is_employee = authz.employee
 
         # Обновление времени истечения
         users_config = current_app.config['HOTSPOT_USERS']
@@ -407,29 +477,17 @@ def auth():
         if expire_time < datetime.datetime.now():
             expire_time += datetime.timedelta(days=1)
 
-        _create_or_udpate_wifi_client(mac, expire_time, is_employee, db_phone)
+        _save_wifi_client(authz, expire_time, is_employee)
 
-        # Очистка кэша и редирект
-        cache.delete(f'{session_id}:sms:code')
-        cache.delete(f'{session_id}:sms:attempts')
-        cache.delete(f'{session_id}:sms:sended')
+        # Очистка кода и редирект
+        instrumentation.timed_cache(otp_store.clear, session_id)
         logger.debug("Auth by code")
         return redirect(url_for('auth.sendin'), 302)
+    elif result == otp.EXHAUSTED:
+        session['error'] = get_translate('errors.auth.bad_code_all')
+        session.pop('phone', None)
+        instrumentation.timed_cache(otp_store.clear, session_id)
+        return redirect(url_for('auth.login'), 302)
     else:
-        attempts = cache.get(f'{session_id}:sms:attempts')
-        if attempts is None:
-            attempts = 3
-
-        attempts += 1
-        
-        if attempts >= 3:
-            session['error'] = get_translate('errors.auth.bad_code_all')
-            session.pop('phone', None)
-            cache.delete(f'{session_id}:sms:code')
-            cache.delete(f'{session_id}:sms:attempts')
-            cache.delete(f'{session_id}:sms:sended')
-            return redirect(url_for('auth.login'), 302)
-        else:
-            cache.set(f'{session_id}:sms:attempts', attempts, timeout=5 * 60)
-            session['error'] = get_translate('errors.auth.bad_code_try')
-            return redirect(url_for('auth.code'), 307)
+        session['error'] = get_translate('errors.auth.bad_code_try')
+        return redirect(url_for('auth.code'), 307)
@@ -1,9 +1,12 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, request, jsonify
 from werkzeug.exceptions import HTTPException
 
-from extensions import get_translate
+from app.assets import asset_url, asset_urls
+from extensions import get_translate, render_cached
 
 error_bp = Blueprint('errors', __name__)
+error_bp.add_app_template_global(asset_url)
+error_bp.add_app_template_global(asset_urls)
 
 
 @error_bp.app_errorhandler(HTTPException)
@@ -21,9 +24,10 @@ def error_handler(err):
         return jsonify(response), err.code
     else:
         # Default to HTML response
-        return render_template(
+        return render_cached(
             'error.html',
+            status=err.code,
             code=err.code,
             name=get_translate(f'errors.http."{str(err.code)}".name', err.name),
             description=get_translate(f'errors.http."{str(err.code)}".description', err.description)
-        ), err.code
+        )
@@ -1,7 +1,45 @@
 import logging
+import threading
+import time
 from abc import ABC, abstractmethod
 
 
+class SendStats:
+    """
+    Thread-safe latency and error counters of an SMS sender.
+
+    Example:
+        stats = SendStats()
+        stats.record(0.25, error=False)
+        stats.snapshot()  # {'count': 1, 'errors': 0, 'last': 0.25, 'avg': 0.25, 'max': 0.25}
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def record(self, latency: float, error: bool = False):
+        with self._lock:
+            self.count += 1
+            self.errors += int(error)
+            self.total += latency
+            self.last = latency
+            self.max = max(self.max, latency)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'count': self.count,
+                'errors': self.errors,
+                'last': self.last,
+                'avg': self.total / self.count if self.count else 0.0,
+                'max': self.max
+            }
+
+
 class BaseSender(ABC):
     """
     BaseSender class for sending SMS using different SMS gateways.
@@ -27,14 +65,34 @@ class BaseSender(ABC):
             recipient (str): The phone number or recipient of the SMS.
             message (str): The content of the SMS.
         """
-        logging.debug(f"{recipient}: {message}")
+        logging.debug("%s: %s", recipient, message)
         pass
 
+    def health_check(self) -> bool:
+        """
+        Checks whether the gateway is able to send messages without sending one.
+
+        Used by the routing sender to probe a gateway before sending traffic to it again.
+        Senders without a cheap status request report themselves healthy.
+        """
+        return True
+
 
 class DebugSender(BaseSender):
-    def __init__(self, *args, **kwargs):
+    """
+    Sender that only logs messages.
+
+    Args:
+        delay (float): Seconds each send takes, to imitate a slow gateway in load tests.
+
+    Example:
+        sender = DebugSender(delay=0.5)
+    """
+    def __init__(self, *args, delay=0, **kwargs):
+        self.delay = float(delay)
         logging.debug('Debug Sender used')
 
     def send_sms(self, recipient: str, message: str):
-        logging.debug(f"{recipient}: {message}")
-
+        if self.delay:
+            time.sleep(self.delay)
+        logging.debug("%s: %s", recipient, message)
@@ -0,0 +1,70 @@
+import json
+
+import urllib3
+
+
+class HTTPTransport:
+    """
+    Pool of persistent keep-alive HTTP(S) connections shared by SMS senders.
+
+    Connections (and the TLS sessions negotiated on them) stay open between requests,
+    so a warm sender pays one request instead of a TCP and TLS handshake per SMS.
+    The pool is thread-safe and can be shared by gunicorn threads and outbox workers.
+
+    Args:
+        pool_size (int): Maximum number of persistent connections per host.
+        connect_timeout (float): Seconds to wait for a connection to be established.
+        read_timeout (float): Seconds to wait for the response.
+        verify (bool): Verify TLS certificates.
+        num_pools (int): Hosts whose connection pools are kept. Every sender owns its transport
+            and talks to a single host (the router or the API), so the default is never exceeded.
+
+    Example:
+        transport = HTTPTransport(pool_size=4, connect_timeout=3, read_timeout=10)
+        status, data = transport.request_json('POST', 'https://sms.ru/sms/send', fields={...})
+    """
+    def __init__(self, pool_size=4, connect_timeout=5, read_timeout=10, verify=True, num_pools=4):
+        verify = str(verify).lower() not in ('0', 'false', 'no', 'off')
+        self.pool_size = int(pool_size)
+        self.timeout = urllib3.Timeout(connect=float(connect_timeout), read=float(read_timeout))
+        self._pool = urllib3.PoolManager(
+            num_pools=int(num_pools),
+            maxsize=self.pool_size,
+            block=False,
+            timeout=self.timeout,
+            retries=False,
+            cert_reqs='CERT_REQUIRED' if verify else 'CERT_NONE'
+        )
+
+    def request_json(self, method, url, body=None, fields=None, headers=None):
+        """
+        Send a request and decode the JSON answer.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute URL.
+            body (dict): JSON body of the request.
+            fields (dict): Form fields, sent url-encoded.
+            headers (dict): Additional request headers.
+
+        Returns:
+            tuple: HTTP status code and decoded JSON (None for an empty body).
+        """
+        headers = dict(headers or {})
+        if body is not None:
+            headers.setdefault('Content-Type', 'application/json')
+            response = self._pool.request(method, url, body=json.dumps(body).encode(), headers=headers)
+        elif fields is not None:
+            response = self._pool.request(method, url, fields=fields, headers=headers, encode_multipart=False)
+        else:
+            response = self._pool.request(method, url, headers=headers)
+
+        try:
+            data = json.loads(response.data) if response.data else None
+        except ValueError:
+            # Прокси или роутер вернул не JSON (например, HTML-страницу ошибки)
+            data = None
+        return response.status, data
+
+    def close(self):
+        self._pool.clear()
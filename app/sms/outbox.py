@@ -0,0 +1,213 @@
+import datetime
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import insert, select, update
+
+import instrumentation
+from app.database import db
+from app.database.models import SmsOutbox
+from app.database.sqlite import commit_with_retry
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+# Текст доставленного или отброшенного сообщения (там одноразовый код) в БД не хранится
+REDACTED = '[redacted]'
+
+
+def enqueue_sms(recipient: str, message: str) -> int:
+    """
+    Store an SMS in the outbox and return its id without waiting for delivery.
+
+    Args:
+        recipient (str): The phone number or recipient of the SMS.
+        message (str): The content of the SMS.
+    """
+    now_time = datetime.datetime.now()
+    result = commit_with_retry(lambda: db.session.execute(
+        insert(SmsOutbox).values(
+            recipient=recipient,
+            message=message,
+            status=PENDING,
+            attempts=0,
+            next_attempt_at=now_time,
+            created_at=now_time
+        )
+    ))
+
+    # Будим фоновые потоки этого процесса, чтобы не ждать poll_interval
+    if worker := current_app.extensions.get('sms_outbox'):
+        worker.wake()
+    return result.inserted_primary_key[0]
+
+
+def get_sms_status(message_id) -> str | None:
+    """Return the delivery status of an outbox message or None if it is unknown."""
+    return db.session.scalar(select(SmsOutbox.status).where(SmsOutbox.id == message_id))
+
+
+def start_outbox_threads(app):
+    """
+    Start the outbox delivery threads in this process when the outbox runs in `thread` mode.
+
+    Called from the serving processes only (each gunicorn worker, the development server), so
+    CLI commands, `purge_worker.py` and benchmarks that build the app do not send SMS.
+
+    Returns:
+        OutboxWorker: The started worker, or None if the outbox is not in `thread` mode.
+    """
+    sms_outbox = app.config.get('SMS_OUTBOX') or {}
+    if not sms_outbox.get('enabled') or sms_outbox.get('mode') != 'thread':
+        return None
+    worker = OutboxWorker.from_config(app, sms_outbox)
+    worker.start()
+    return worker
+
+
+class OutboxWorker:
+    """
+    Pool of background threads that drains the SMS outbox.
+
+    Messages are claimed with a conditional UPDATE, so any number of threads and processes
+    can drain the same outbox. A claim is a lease: if a worker dies while sending, the message
+    becomes pending again after `lease` seconds. Failed sends are retried with exponential
+    backoff until `max_attempts` is reached.
+
+    Args:
+        app (Flask): Application whose database and `SENDER` are used.
+        workers (int): Number of delivery threads.
+        poll_interval (float): Seconds to wait when the outbox is empty.
+        max_attempts (int): Attempts before a message is marked as failed.
+        backoff (float): Delay in seconds before the first retry, doubled on each next one.
+        lease (float): Seconds a claimed message stays reserved for its worker.
+        batch_size (int): Messages claimed by a thread at once.
+
+    Example:
+        worker = OutboxWorker(app, workers=2)
+        worker.start()
+    """
+    def __init__(self, app, workers=2, poll_interval=1.0, max_attempts=5, backoff=2.0, lease=60.0, batch_size=10):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    @classmethod
+    def from_config(cls, app, outbox_config):
+        return cls(
+            app,
+            workers=outbox_config.get('workers', 2),
+            poll_interval=outbox_config.get('poll_interval', 1.0),
+            max_attempts=outbox_config.get('max_attempts', 5),
+            backoff=outbox_config.get('backoff', 2.0),
+        )
+
+    def start(self):
+        self.app.extensions['sms_outbox'] = self
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'sms-outbox-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info('SMS outbox started with %s workers', self.workers)
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    processed = self.drain_once()
+            except Exception:
+                logging.exception('SMS outbox iteration failed')
+                processed = 0
+
+            if not processed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def drain_once(self) -> int:
+        """Claim a batch of due messages, send them and return how many were processed."""
+        claimed = self._claim()
+        if not claimed:
+            return 0
+
+        sender = self.app.config['SENDER']
+        for message_id, recipient, message, attempts in claimed:
+            error = None
+            try:
+                if instrumentation.timed_send(sender, recipient, message):
+                    error = 'Sender returned an error'
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            self._finish(message_id, attempts + 1, error)
+        return len(claimed)
+
+    def _claim(self):
+        # Выборка и захват повторяются целиком, если SQLite занята другим процессом
+        return commit_with_retry(self._claim_due)
+
+    def _claim_due(self):
+        now_time = datetime.datetime.now()
+        due = (
+            SmsOutbox.status.in_((PENDING, SENDING)),
+            SmsOutbox.next_attempt_at <= now_time
+        )
+        candidates = db.session.execute(
+            select(SmsOutbox.id, SmsOutbox.recipient, SmsOutbox.message, SmsOutbox.attempts)
+            .where(*due)
+            .order_by(SmsOutbox.next_attempt_at)
+            .limit(self.batch_size)
+        ).all()
+
+        claimed = []
+        lease_until = now_time + datetime.timedelta(seconds=self.lease)
+        for candidate in candidates:
+            result = db.session.execute(
+                update(SmsOutbox)
+                .where(SmsOutbox.id == candidate.id, *due)
+                .values(status=SENDING, next_attempt_at=lease_until)
+                .execution_options(synchronize_session=False)
+            )
+            # Сообщение уже забрал другой поток или процесс
+            if result.rowcount == 1:
+                claimed.append(tuple(candidate))
+        return claimed
+
+    def _finish(self, message_id, attempts, error):
+        now_time = datetime.datetime.now()
+        if error is None:
+            values = {'status': SENT, 'message': REDACTED, 'attempts': attempts, 'sent_at': now_time, 'error': None}
+        elif attempts >= self.max_attempts:
+            logging.error('SMS %s failed after %s attempts: %s', message_id, attempts, error)
+            values = {'status': FAILED, 'message': REDACTED, 'attempts': attempts, 'error': error[:255]}
+        else:
+            delay = datetime.timedelta(seconds=self.backoff * 2 ** (attempts - 1))
+            logging.warning('SMS %s attempt %s failed, retry in %s: %s', message_id, attempts, delay, error)
+            values = {'status': PENDING, 'attempts': attempts, 'next_attempt_at': now_time + delay, 'error': error[:255]}
+
+        commit_with_retry(lambda: db.session.execute(
+            update(SmsOutbox)
+            .where(SmsOutbox.id == message_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ))
@@ -1,27 +1,49 @@
 import logging
 
-from smsru_api import Client
-
 from app.sms import BaseSender
+from app.sms.http import HTTPTransport
 
 
 class SMSRUSender(BaseSender):
     """
     SMSRUSender class for sending SMS using the SmsRu API.
 
+    The sender calls the sms.ru HTTP API over a pool of persistent keep-alive connections.
+
     Args:
         api_key (str): The API key for accessing the SmsRu API.
+        pool_size (int): Maximum number of persistent connections to sms.ru.
+        connect_timeout (float): Seconds to wait for a connection to sms.ru.
+        read_timeout (float): Seconds to wait for the answer.
 
     Example:
         sender = SMSRUSender('your_api_key')
         sender.send_sms('+1234567890', 'Test message')
     """
-    def __init__(self, api_key, *args, **kwargs):
-        self._api = Client(api_key)
+    API_URL = 'https://sms.ru'
+
+    def __init__(self, api_key, pool_size=4, connect_timeout=5, read_timeout=10, *args, **kwargs):
+        self._api_key = api_key
+        self._transport = HTTPTransport(pool_size, connect_timeout, read_timeout)
+
+    def _request(self, path, data):
+        fields = {'api_id': self._api_key, 'json': 1, **data}
+        status, res = self._transport.request_json('POST', self.API_URL + path, fields=fields)
+        if status >= 400:
+            logging.error('SMS.ru HTTP error %s', status)
+            return {}
+        return res or {}
 
     def send_sms(self, recipient, message):
-        if self._api.send(recipient, message=message).get('status') == "OK":
+        if self._request('/sms/send', {'to': recipient, 'msg': message}).get('status') == "OK":
             logging.info('SMS was send successfully')
         else:
             logging.error('Error')
             return 1
+
+    def health_check(self):
+        try:
+            return self._request('/my/balance', {}).get('status') == "OK"
+        except Exception as e:
+            logging.warning('SMS.ru health check failed: %s', e)
+            return False
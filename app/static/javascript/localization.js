@@ -40,6 +40,8 @@ function getTranslate(query, placeholders = null, replace = null) {
     const html = document.getElementsByTagName('html')[0];
     userLanguage = html.lang;
 
-    await loadLocalization(`/static/language/${userLanguage}.json`);
+    // После сборки ассетов файлы языков имеют хэш в имени
+    const languageUrls = window.LANGUAGE_URLS || {};
+    await loadLocalization(languageUrls[userLanguage] || `/static/language/${userLanguage}.json`);
     console.log(getTranslate('language', 'Err'));
 })();
\ No newline at end of file
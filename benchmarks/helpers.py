@@ -0,0 +1,183 @@
+"""
+Per-call time of the pure helpers on the auth hot path, compared with the committed baseline.
+
+Measures the CHAP octal decoding and md5, the fingerprint sha256, phone normalization, the
+log masks and `get_translate`. Each helper is timed together with a reference in the same run:
+its previous implementation where it changed, otherwise a fixed md5 yardstick. The baseline in
+benchmarks/baselines/helpers.json stores only these ratios, so it holds on any machine:
+    python benchmarks/helpers.py                      # compare with the committed baseline
+    python benchmarks/helpers.py --max-regression 0.25
+    python benchmarks/helpers.py --save               # store the new ratios after an intended change
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import timeit
+from hashlib import md5
+
+from flask import Flask
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.pages.auth import _chap_password, _mask_mac, _mask_phone, _octal_string_to_bytes, _user_fingerprint
+from extensions import build_language_catalog, get_translate, normalize_phone
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines', 'helpers.json')
+LANGUAGE_FOLDER = os.path.join(root_dir, 'app', 'static', 'language')
+
+CHAP_ID = '\\245'
+CHAP_CHALLENGE = ''.join(f'\\{byte:03o}' for byte in range(200, 216))
+HARDWARE_FP = md5(b'device').hexdigest()
+
+
+def reference_octal_string_to_bytes(oct_string):
+    """Прежняя реализация: 8 ** i на каждую цифру."""
+    if not oct_string:
+        return b''
+    byte_nums = []
+    for octal_num in oct_string.split("\\")[1:]:
+        decimal_value = 0
+        for i in range(len(octal_num)):
+            decimal_value += int(octal_num[-(i + 1)]) * 8 ** i
+        byte_nums.append(decimal_value)
+    return bytes(byte_nums)
+
+
+def reference_chap_password(chap_id, chap_challenge, password):
+    return md5(
+        reference_octal_string_to_bytes(chap_id) + password.encode() + reference_octal_string_to_bytes(chap_challenge)
+    ).hexdigest()
+
+
+def reference_normalize_phone(phone_number):
+    """Прежняя реализация: две подстановки регулярными выражениями."""
+    if not phone_number:
+        return ''
+    num = re.sub(r'\D', '', phone_number)
+    num = re.sub(r'^8', '7', num)
+    if num.startswith('07'):
+        num = '7' + num[2:]
+    return num
+
+
+def yardstick():
+    """Fixed workload for the helpers without a previous implementation."""
+    return md5(b'hotspot:' * 8).hexdigest()
+
+
+def reference_mask_mac(mac):
+    parts = mac.split(':')
+    return 'XX:XX:XX:' + ':'.join(parts[3:])
+
+
+# Имя -> (прежняя реализация или None - тогда мерка yardstick, текущая)
+CASES = {
+    'octal_string_to_bytes': (
+        lambda: reference_octal_string_to_bytes(CHAP_CHALLENGE), lambda: _octal_string_to_bytes(CHAP_CHALLENGE)
+    ),
+    'chap_password': (
+        lambda: reference_chap_password(CHAP_ID, CHAP_CHALLENGE, 'secret'),
+        lambda: _chap_password(CHAP_ID, CHAP_CHALLENGE, 'secret'),
+    ),
+    'user_fingerprint': (None, lambda: _user_fingerprint(HARDWARE_FP, '79991234567')),
+    'normalize_phone': (
+        lambda: reference_normalize_phone('8 (999) 123-45-67'), lambda: normalize_phone('8 (999) 123-45-67')
+    ),
+    'mask_phone': (None, lambda: _mask_phone('79991234567')),
+    'mask_mac': (lambda: reference_mask_mac('02:00:00:12:34:56'), lambda: _mask_mac('02:00:00:12:34:56')),
+    'get_translate': (None, lambda: get_translate('errors.auth.bad_code_try')),
+}
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.config['LANGUAGE_DEFAULT'] = 'en'
+    app.config['LANGUAGE_CONTENT'] = {}
+    for filename in os.listdir(LANGUAGE_FOLDER):
+        if filename.endswith('.json'):
+            with open(os.path.join(LANGUAGE_FOLDER, filename), encoding='utf-8') as lang_file:
+                app.config['LANGUAGE_CONTENT'][os.path.splitext(filename)[0]] = json.load(lang_file)
+    app.config['LANGUAGE_CATALOG'] = build_language_catalog(app.config['LANGUAGE_CONTENT'])
+    return app
+
+
+def per_call_ns(current, reference, count, rounds=9) -> tuple:
+    """Best per-call time of a helper and its reference, timed in turns so both see the same load."""
+    current()
+    reference()
+    current_best = reference_best = float('inf')
+    for _ in range(rounds):
+        current_best = min(current_best, timeit.timeit(current, number=count))
+        reference_best = min(reference_best, timeit.timeit(reference, number=count))
+    return current_best / count * 1e9, reference_best / count * 1e9
+
+
+def measure(count) -> dict:
+    app = create_app()
+    results = {}
+    # get_translate определяет язык из запроса - все замеры внутри одного запроса
+    with app.test_request_context('/', headers={'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8'}):
+        for name, (reference, current) in CASES.items():
+            current_ns, reference_ns = per_call_ns(current, reference or yardstick, count)
+            results[name] = {
+                'current_ns': round(current_ns, 1),
+                'reference': 'yardstick' if reference is None else 'previous',
+                'reference_ns': round(reference_ns, 1),
+                # Время относительно мерки из того же запуска не зависит от машины
+                'ratio': round(current_ns / reference_ns, 3),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=50000, help='Calls per measurement')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--max-regression', type=float, help='Fail if a helper is slower than the baseline by this share')
+    args = parser.parse_args()
+
+    results = measure(args.count)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file).get('results', {})
+    elif args.max_regression is not None and not args.save:
+        sys.exit(f'No baseline at {BASELINE_PATH}, store one with --save first')
+
+    regressions = []
+    for name, result in results.items():
+        line = (
+            f"{name:>22}: {result['current_ns']:8.0f} ns  "
+            f"{result['reference']} {result['reference_ns']:8.0f} ns (ratio {result['ratio']:.3f})"
+        )
+        if (before := baseline.get(name, {}).get('ratio')) is not None:
+            change = result['ratio'] / before - 1
+            line += f"  baseline {before:.3f} ({change:+.0%})"
+            if args.max_regression is not None and change > args.max_regression:
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as baseline_file:
+            json.dump({
+                'python': platform.python_version(),
+                'count': args.count,
+                'results': {
+                    name: {'reference': result['reference'], 'ratio': result['ratio']}
+                    for name, result in results.items()
+                },
+            }, baseline_file, indent=2)
+            baseline_file.write('\n')
+        print(f'Baseline saved to {BASELINE_PATH}')
+
+    if regressions:
+        sys.exit(f"Slower than the baseline: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Concurrent login writes against a SQLite file with the `wal` mode on and off.
+
+Every process plays a gunicorn worker: each login resolves the client and then writes the
+phone number and wifi client rows the way `code()` does, retrying on lock contention:
+    python benchmarks/sqlite_login.py --processes 4 --logins 500
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.database import db
+from app.database.authorization import resolve_authorization
+from app.database.sqlite import commit_with_retry, setup_sqlite
+from app.pages.auth import _write_wifi_client
+from extensions import cache
+
+
+def create_app(path, sqlite_mode):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    db.init_app(app)
+    cache.init_app(app)
+    with app.app_context():
+        setup_sqlite(db.engine, {'sqlite_mode': sqlite_mode})
+    return app
+
+
+def worker(path, sqlite_mode, number, logins, results):
+    failed = logins
+    try:
+        app = create_app(path, sqlite_mode)
+        with app.app_context():
+            failed = 0
+            for login in range(logins):
+                mac = f'02:00:00:{number:02x}:{login // 256:02x}:{login % 256:02x}'
+                phone = f'79{number:03d}{login:06d}'
+                expiration = datetime.datetime.now() + datetime.timedelta(hours=24)
+                try:
+                    authz = resolve_authorization(mac=mac, phone=phone)
+                    commit_with_retry(lambda: _write_wifi_client(authz, expiration, False))
+                except OperationalError:
+                    db.session.rollback()
+                    failed += 1
+    finally:
+        # Родитель ждет ответа от каждого процесса
+        results.put(failed)
+
+
+def run(sqlite_mode, processes, logins):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'hotspot.db')
+        app = create_app(path, sqlite_mode)
+        with app.app_context():
+            db.create_all()
+            db.engine.dispose()
+
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=worker, args=(path, sqlite_mode, number, logins, results))
+            for number in range(processes)
+        ]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        failed = sum(results.get() for _ in workers)
+
+    total = processes * logins
+    print(f'{sqlite_mode:>4}: {total / elapsed:8.1f} logins/s, {failed} failed of {total}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--logins', type=int, default=500)
+    args = parser.parse_args()
+
+    for sqlite_mode in ('off', 'wal'):
+        run(sqlite_mode, args.processes, args.logins)
+
+
+if __name__ == '__main__':
+    main()
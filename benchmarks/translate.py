@@ -0,0 +1,87 @@
+"""
+Render time of the portal pages with the jmespath translation lookup and with the precompiled catalog.
+
+Uses the real templates and language files, no database or cache is needed:
+    python benchmarks/translate.py --count 2000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import jmespath
+from flask import Flask, current_app, render_template, request, session
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from extensions import build_language_catalog, get_translate
+
+LANGUAGE_FOLDER = os.path.join(root_dir, 'app', 'static', 'language')
+
+
+def jmespath_translate(path, replace=None, lang=None):
+    """Прежняя реализация get_translate для сравнения."""
+    language_content = current_app.config.get('LANGUAGE_CONTENT')
+    lang = (
+        lang or
+        session.get("user_lang") or
+        request.accept_languages.best_match(list(language_content.keys())) or
+        current_app.config.get('LANGUAGE_DEFAULT')
+    )
+    if lang not in language_content:
+        lang = current_app.config.get('LANGUAGE_DEFAULT')
+    translation = jmespath.search(f"{lang}.{path}", language_content)
+    return translation if isinstance(translation, str) else (replace or path)
+
+
+def create_app(translate):
+    app = Flask(__name__, root_path=os.path.join(root_dir, 'app'))
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.config['LANGUAGE_DEFAULT'] = 'en'
+    app.config['LANGUAGE_CONTENT'] = {}
+    for filename in os.listdir(LANGUAGE_FOLDER):
+        if filename.endswith('.json'):
+            with open(os.path.join(LANGUAGE_FOLDER, filename), encoding='utf-8') as lang_file:
+                app.config['LANGUAGE_CONTENT'][os.path.splitext(filename)[0]] = json.load(lang_file)
+    app.config['LANGUAGE_CATALOG'] = build_language_catalog(app.config['LANGUAGE_CONTENT'])
+
+    @app.context_processor
+    def inject_get_translate():
+        return dict(get_translate=translate)
+    return app
+
+
+PAGES = {
+    'auth/login.html': {'error': None},
+    'error.html': {'code': 404, 'name': 'Not Found', 'description': 'The requested URL was not found.'},
+}
+
+
+def measure(translate, template, count):
+    app = create_app(translate)
+    context = PAGES[template]
+    headers = {'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7'}
+
+    def render():
+        # Новый контекст на каждый рендер - язык определяется заново, как в реальном запросе
+        with app.test_request_context('/', headers=headers):
+            render_template(template, **context)
+
+    render()
+    return min(timeit.repeat(render, number=count, repeat=3)) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000, help='Renders per measurement')
+    args = parser.parse_args()
+
+    for template in PAGES:
+        before = measure(jmespath_translate, template, args.count)
+        after = measure(get_translate, template, args.count)
+        print(f"{template:>16}: jmespath={before * 1e6:.0f} us catalog={after * 1e6:.0f} us speedup={before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Concurrent `/code` throughput with a slow SMS sender under each gunicorn worker class.
+
+Starts gunicorn with `gunicorn.conf.py` for every worker class against a temporary SQLite
+database and a DebugSender that sleeps `--sender-delay` seconds per SMS, then sends
+`--requests` code requests from `--concurrency` clients, each with its own session:
+    python benchmarks/worker_classes.py --workers 2 --concurrency 32 --requests 200
+gevent is skipped if it is not installed (pip install -r requirements-gevent.txt).
+"""
+import argparse
+import http.cookiejar
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f'gunicorn did not start on port {port}')
+
+
+def request_code(port, number) -> float:
+    """Открыть страницу входа с MAC и запросить код; возвращает время запроса /code."""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    base = f'http://127.0.0.1:{port}'
+    opener.open(f'{base}/login', urllib.parse.urlencode({
+        'mac': f'02:00:00:00:{number // 256:02x}:{number % 256:02x}',
+        'link-login-only': 'http://hotspot.lan/login',
+        'link-orig': 'http://example.com/',
+    }).encode()).read()
+
+    start = time.perf_counter()
+    opener.open(f'{base}/code', urllib.parse.urlencode({'phone': f'7999{number:07d}'}).encode()).read()
+    return time.perf_counter() - start
+
+
+def run(worker_class, args, env):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'main:flask_app'],
+        cwd=root_dir,
+        env={
+            **env,
+            'GUNICORN_WORKER_CLASS': worker_class,
+            'GUNICORN_WORKERS': str(args.workers),
+            'GUNICORN_THREADS': str(args.threads),
+            'GUNICORN_BIND': '127.0.0.1',
+            'GUNICORN_PORT': str(port),
+            'GUNICORN_LOG_LEVEL': 'warning',
+        },
+    )
+    try:
+        wait_for_port(port)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            latencies = list(executor.map(lambda number: request_code(port, number), range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(
+        f'{worker_class:>8}: {args.requests / elapsed:7.1f} req/s, '
+        f'p50 {statistics.median(latencies) * 1000:6.0f} ms, max {max(latencies) * 1000:6.0f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gthread worker')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--sender-delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            'DEBUG': 'false',
+            'HOTSPOT_DB_URL': f"sqlite:///{os.path.join(tmp, 'hotspot.db')}",
+            # Сессии в cookie и кэш в памяти, чтобы не нужен был memcached
+            'CACHE_URL': 'simple',
+            'HOTSPOT_SESSION_STORE': 'cookie',
+            'FLASK_SECRET_KEY': 'benchmark',
+            'HOTSPOT_SENDER_TYPE': 'debug',
+            'HOTSPOT_SENDER_DELAY': str(args.sender_delay),
+        }
+        # Таблицы создаются заранее, чтобы воркеры не создавали их одновременно
+        subprocess.run([sys.executable, 'init_database.py'], cwd=root_dir, env=env, check=True)
+
+        for worker_class in ('sync', 'gthread', 'gevent'):
+            if worker_class == 'gevent':
+                try:
+                    import gevent  # noqa: F401
+                except ImportError:
+                    print('  gevent: not installed, skipped')
+                    continue
+            run(worker_class, args, env)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Build the production static assets into app/static/dist.
+
+Bundles and minifies the CSS and JS listed in app.assets.BUNDLES, copies the language
+files and the favicon, names every file by its content hash and writes gzip (and brotli,
+if the package is installed) variants next to it. manifest.json maps the logical names
+used by `asset_urls` to the built files:
+    python build_assets.py
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from app.assets import BUNDLES, DIST_FOLDER, MANIFEST_FILE
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+STATIC_FOLDER = os.path.join(basedir, 'app', 'static')
+SINGLE_FILES = ('img', 'language')
+COMPRESSIBLE = ('.css', '.js', '.json', '.ico', '.svg')
+
+
+def minify_css(source: str) -> str:
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source: str) -> str:
+    # Без парсера JS: только отступы, пустые строки и однострочные комментарии целиком
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def _read(static_folder, path) -> str:
+    with open(os.path.join(static_folder, path), 'r', encoding='utf-8') as source_file:
+        return source_file.read()
+
+
+def build_bundle(static_folder, name, sources) -> bytes:
+    if name.endswith('.css'):
+        return '\n'.join(minify_css(_read(static_folder, source)) for source in sources).encode()
+    # ; между файлами, чтобы склейка не поменяла смысл последнего выражения
+    return ';\n'.join(minify_js(_read(static_folder, source)) for source in sources).encode()
+
+
+def write_asset(dist_folder, name, content: bytes) -> str:
+    stem, extension = os.path.splitext(name)
+    built_name = f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+    path = os.path.join(dist_folder, built_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as asset_file:
+        asset_file.write(content)
+
+    if extension in COMPRESSIBLE:
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+        for suffix, compressed in variants:
+            # Сжатый вариант не нужен, если он не меньше оригинала
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as asset_file:
+                    asset_file.write(compressed)
+    return built_name
+
+
+def build(static_folder=STATIC_FOLDER):
+    dist_folder = os.path.join(static_folder, DIST_FOLDER)
+    shutil.rmtree(dist_folder, ignore_errors=True)
+    os.makedirs(dist_folder)
+
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        manifest[name] = write_asset(dist_folder, name, build_bundle(static_folder, name, sources))
+
+    for folder in SINGLE_FILES:
+        for filename in sorted(os.listdir(os.path.join(static_folder, folder))):
+            name = f'{folder}/{filename}'
+            with open(os.path.join(static_folder, name), 'rb') as source_file:
+                content = source_file.read()
+            if filename.endswith('.json'):
+                content = json.dumps(json.loads(content), ensure_ascii=False, separators=(',', ':')).encode()
+            manifest[name] = write_asset(dist_folder, name, content)
+
+    with open(os.path.join(dist_folder, MANIFEST_FILE), 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    manifest = build()
+    dist_folder = os.path.join(STATIC_FOLDER, DIST_FOLDER)
+    for name, built_name in manifest.items():
+        size = os.path.getsize(os.path.join(dist_folder, built_name))
+        gz_path = os.path.join(dist_folder, built_name + '.gz')
+        gz_size = os.path.getsize(gz_path) if os.path.exists(gz_path) else size
+        print(f'{name:>20} -> {built_name} ({size} B, gzip {gz_size} B)')
+
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,9 @@ if [ ! -f "$INIT_FLAG" ]; then
     echo "Database initialized. Creating marker file."
     touch "$INIT_FLAG"
 else
-    echo "Database already initialized. Skipping initialization."
+    # Миграции идемпотентны: применяются только недостающие версии схемы
+    echo "Database already initialized. Applying migrations..."
+    python ./init_database.py
 fi
 
 # Проверяем наличие переменной окружения SECRET_KEY
@@ -23,11 +25,7 @@ if [ -z "$FLASK_SECRET_KEY" ]; then
     echo "Flask Secret key Generated"
 fi
 
-# Устанавливаем параметры Gunicorn из переменных окружения или используем значения по умолчанию
-GUNICORN_WORKERS=${GUNICORN_WORKERS:-4}
-GUNICORN_LOG_LEVEL=${GUNICORN_LOG_LEVEL:-info}
-GUNICORN_PORT=${GUNICORN_PORT:-8080}
-GUNICORN_ADDR=${GUNICORN_BIND:-[::]}
+# Параметры Gunicorn (GUNICORN_WORKERS, GUNICORN_WORKER_CLASS, GUNICORN_THREADS, GUNICORN_PORT, ...) читает gunicorn.conf.py
 
 CACHE_SIZE=${CACHE_SIZE:-1024}
 
@@ -38,9 +36,28 @@ else
     echo "Using external cache: $CACHE_URL"
 fi
 
-# Проверяем значение переменной DEBUG
-if [ "$DEBUG" = "true" ]; then
-    exec gunicorn -w "$GUNICORN_WORKERS" -b "$GUNICORN_ADDR:$GUNICORN_PORT" --reload --log-level=debug main:flask_app
-else
-    exec gunicorn -w "$GUNICORN_WORKERS" -b "$GUNICORN_ADDR:$GUNICORN_PORT" --log-level="$GUNICORN_LOG_LEVEL" main:flask_app
-fi
\ No newline at end of file
+# Метрики воркеров gunicorn и sms_worker.py пишутся в общий каталог, /metrics собирает их все.
+# Каталог очищается здесь, до запуска обоих, а не в on_starting gunicorn, иначе стерлись бы файлы sms_worker.py
+case "$(echo "${HOTSPOT_METRICS_ENABLED:-false}" | tr '[:upper:]' '[:lower:]')" in
+    1|true|yes|on)
+        export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/hotspot-metrics}"
+        rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+        mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+        export HOTSPOT_METRICS_DIR_CLEARED=true
+        ;;
+esac
+
+# Отдельный процесс отправки SMS (завершается с кодом 0, если очередь не в режиме process).
+# После падения перезапускается через 5 секунд
+(
+    until python ./sms_worker.py; do
+        echo "SMS worker exited with code $?, restarting in 5s..."
+        sleep 5
+    done
+) &
+
+# Периодическое удаление истекших клиентов (завершается сразу, если не включено)
+python ./purge_worker.py &
+
+# Класс воркеров: sync, gthread или gevent (нужен requirements-gevent.txt)
+exec gunicorn -c gunicorn.conf.py main:flask_app
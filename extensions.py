@@ -1,46 +1,252 @@
+import hashlib
+import json
+import os
 import re
-import jmespath
-from flask import session, request, current_app
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import session, request, current_app, g, make_response, render_template
 from flask_caching import Cache
 
+import instrumentation
 
-cache = Cache()
 
+class InstrumentedCache(Cache):
+    """Cache that counts hits and misses per key namespace for `/metrics` and times round trips for profiling."""
+    def get(self, key):
+        value = instrumentation.timed_cache(super().get, key)
+        instrumentation.observe_cache(key, value is not None)
+        return value
 
-def get_translate(path, replace=None, lang=None):
+    def set(self, *args, **kwargs):
+        return instrumentation.timed_cache(super().set, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return instrumentation.timed_cache(super().add, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return instrumentation.timed_cache(super().delete, *args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        return instrumentation.timed_cache(super().get_many, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return instrumentation.timed_cache(super().set_many, *args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return instrumentation.timed_cache(super().delete_many, *args, **kwargs)
+
+    def has(self, *args, **kwargs):
+        return instrumentation.timed_cache(super().has, *args, **kwargs)
+
+
+cache = InstrumentedCache()
+
+
+def build_language_catalog(language_content: dict) -> dict:
+    """
+    Flatten the language files into one lookup table per language.
+
+    Nested keys are joined with dots, so `errors.http.404.name` maps straight to the
+    translated string and `get_translate` is a dict lookup instead of a jmespath search.
+
+    Args:
+        language_content (dict): Parsed language files by language name.
+
+    Example:
+        build_language_catalog({'en': {'html': {'title': 'Title'}}})
+        # {'en': {'html.title': 'Title'}}
+    """
+    catalog = {}
+    for lang, content in language_content.items():
+        flat = {}
+        stack = [('', content)]
+        while stack:
+            prefix, node = stack.pop()
+            for key, value in node.items():
+                key = f'{prefix}{key}'
+                if isinstance(value, dict):
+                    stack.append((f'{key}.', value))
+                elif isinstance(value, str):
+                    flat[key] = value
+        catalog[lang] = flat
+    return catalog
+
+
+def _get_language_catalog() -> dict:
+    catalog = current_app.config.get('LANGUAGE_CATALOG')
+    if catalog is not None:
+        return catalog
+
+    # Каталог не собран при старте (например, в тестах) - собираем один раз на приложение
     language_content = current_app.config.get('LANGUAGE_CONTENT')
-    supported_languages = list(language_content.keys())
+    cached = current_app.extensions.get('language_catalog')
+    if cached is None or cached[0] is not language_content:
+        cached = (language_content, build_language_catalog(language_content))
+        current_app.extensions['language_catalog'] = cached
+    return cached[1]
+
+
+def _get_request_language(catalog) -> str:
+    user_lang = session.get("user_lang")
+    # Язык определяется один раз за запрос, пока пользователь не сменил его в сессии
+    memo = g.get('_translate_lang')
+    if memo is not None and memo[0] == user_lang:
+        return memo[1]
 
-    # Определяем язык: сначала из параметра, затем из сессии, затем из заголовка, и, наконец, по умолчанию
     lang = (
-        lang or 
-        session.get("user_lang") or 
-        request.accept_languages.best_match(supported_languages) or 
+        user_lang or
+        request.accept_languages.best_match(list(catalog.keys())) or
         current_app.config.get('LANGUAGE_DEFAULT')
     )
-    
+    g._translate_lang = (user_lang, lang)
+    return lang
+
+
+def get_request_language() -> str:
+    """Return the language of the current request, resolved once per request."""
+    return _get_request_language(_get_language_catalog())
+
+
+def get_translate(path, replace=None, lang=None):
+    catalog = _get_language_catalog()
+
+    # Определяем язык: сначала из параметра, затем из сессии, затем из заголовка, и, наконец, по умолчанию
+    lang = lang or _get_request_language(catalog)
+
     if not replace:
         replace = path
 
     # Проверяем, поддерживается ли язык, иначе используем язык по умолчанию
-    if lang not in language_content:
-        lang = current_app.config.get('LANGUAGE_DEFAULT')
-
-    expression = f"{lang}.{path}"
+    translations = catalog.get(lang)
+    if translations is None:
+        translations = catalog.get(current_app.config.get('LANGUAGE_DEFAULT'), {})
 
-    # Выполняем поиск перевода
-    translation = jmespath.search(expression, language_content)
+    translation = translations.get(path)
+    if translation is None and '"' in path:
+        # Пути в стиле jmespath: errors.http."404".name
+        translation = translations.get(path.replace('"', ''))
 
     # Возвращаем перевод, если он найден, иначе возвращаем исходный путь
-    return translation if isinstance(translation, str) else replace
+    return translation if translation is not None else replace
+
+
+class PageCache:
+    """
+    Per-worker LRU cache of rendered portal pages.
+
+    Entries are keyed by template, language, config version and the template context,
+    and hold the rendered body with its ETag. The config version changes with the company
+    name, the default language and the templates, language files and built assets on disk, so a deploy
+    or a settings change never serves a stale page.
+
+    Args:
+        version (str): Config version mixed into every key.
+        last_modified (datetime): Time of the newest template or language file.
+        max_size (int): Maximum number of rendered pages kept.
+    """
+    def __init__(self, version, last_modified, max_size=256):
+        self.version = version
+        self.last_modified = last_modified
+        self.max_size = max_size
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_app(cls, app):
+        newest = 0.0
+        for folder in (app.template_folder, os.path.join(app.static_folder, 'language'), os.path.join(app.static_folder, 'dist')):
+            folder = os.path.join(app.root_path, folder)
+            for root, _, files in os.walk(folder):
+                for filename in files:
+                    newest = max(newest, os.path.getmtime(os.path.join(root, filename)))
+
+        config = app.config
+        version = hashlib.sha1(json.dumps([
+            config.get('COMPANY_NAME'),
+            config.get('LANGUAGE_DEFAULT'),
+            bool((config.get('SMS_OUTBOX') or {}).get('enabled')),
+            newest
+        ]).encode()).hexdigest()[:16]
+        last_modified = datetime.fromtimestamp(int(newest), timezone.utc)
+        return cls(version, last_modified, config.get('PAGE_CACHE_SIZE', 256))
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def set(self, key, page):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+
+
+def render_cached(template, status=200, **context):
+    """
+    Render a portal page once per language and context and answer revalidation with 304.
+
+    The page may depend only on the given context, the language, `session['user_lang']`,
+    `session['link-login-only']` and the config. Responses carry ETag and Last-Modified,
+    and a conditional GET for an unchanged 200 page gets an empty 304.
+
+    Args:
+        template (str): Template name.
+        status (int): Response status code.
+        **context: Template context.
+
+    Example:
+        return render_cached('auth/login.html', error=error)
+    """
+    if current_app.debug or not current_app.config.get('PAGE_CACHE', True):
+        return make_response(render_template(template, **context), status)
+
+    page_cache = current_app.extensions.get('page_cache')
+    if page_cache is None:
+        page_cache = current_app.extensions.setdefault('page_cache', PageCache.for_app(current_app))
+
+    key = (
+        template,
+        page_cache.version,
+        get_request_language(),
+        session.get('user_lang'),
+        session.get('link-login-only'),
+        tuple(sorted(context.items()))
+    )
+    page = page_cache.get(key)
+    if page is None:
+        body = render_template(template, **context)
+        page = (body, hashlib.sha1(body.encode()).hexdigest())
+        page_cache.set(key, page)
+
+    body, etag = page
+    response = make_response(body, status)
+    response.set_etag(etag)
+    response.last_modified = page_cache.last_modified
+    # Браузер каждый раз перепроверяет страницу, но получает 304 без тела
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Language')
+    response.vary.add('Cookie')
+    if status == 200:
+        response.make_conditional(request)
+    return response
+
+
+NON_DIGITS = re.compile(r'\D')
 
 
 def normalize_phone(phone_number: str) -> str:
     """Normalize phone to digits, leading 7 for Russia-style numbers."""
     if not phone_number:
         return ''
-    num = re.sub(r'\D', '', phone_number)
-    num = re.sub(r'^8', '7', num)
+    num = NON_DIGITS.sub('', phone_number)
+    if num.startswith('8'):
+        num = '7' + num[1:]
     if num.startswith('07'):  # guard: if weird leading zero
         num = '7' + num[2:]
     return num
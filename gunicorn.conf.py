@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+# Настройки Gunicorn из переменных окружения: gunicorn -c gunicorn.conf.py main:flask_app
+import importlib.util
+import os
+import shutil
+
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class not in WORKER_CLASSES:
+    raise NotImplementedError(f"Not implemented gunicorn worker class {worker_class}")
+
+bind = f"{os.environ.get('GUNICORN_BIND', '[::]')}:{os.environ.get('GUNICORN_PORT', '8080')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+# gthread: потоков на процесс; пул соединений с БД (db.pool_size + db.max_overflow) должен быть не меньше.
+# Для sync всегда 1: при threads > 1 Gunicorn молча заменяет sync на gthread
+threads = int(os.environ.get('GUNICORN_THREADS', 8)) if worker_class == 'gthread' else 1
+# gevent: одновременных запросов на процесс
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+if os.environ.get('DEBUG', 'false').lower() == 'true':
+    reload = True
+    loglevel = 'debug'
+else:
+    loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# Метрики воркеров пишутся в общий каталог, /metrics любого воркера отдает сумму по всем.
+# Каталог задается до первого импорта prometheus_client
+if importlib.util.find_spec('prometheus_client') is not None \
+        and os.environ.get('HOTSPOT_METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes', 'on'):
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/hotspot-metrics')
+
+
+def on_starting(server):
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    # entrypoint.sh уже очистил каталог до запуска sms_worker.py, который пишет туда же
+    if metrics_dir and not os.environ.get('HOTSPOT_METRICS_DIR_CLEARED'):
+        # Файлы прошлого запуска исказили бы счетчики
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    # psycopg2 - C-расширение, без psycogreen его запросы блокируют весь процесс gevent
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        return
+    patch_psycopg()
+
+
+def post_worker_init(worker):
+    # Потоки очереди SMS запускаются только в воркерах, а не в CLI и purge_worker.py
+    from app.sms.outbox import start_outbox_threads
+    start_outbox_threads(worker.wsgi)
@@ -0,0 +1,277 @@
+# instrumentation.py
+# Метрики Prometheus и профилирование запросов: SQL, обращения к кэшу и внешние вызовы (SMS).
+# Без prometheus_client (requirements-metrics.txt) метрики не собираются, профилирование работает.
+import hmac
+import logging
+import os
+import time
+
+from flask import Blueprint, Response, abort, current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import logger
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+SMS_BUCKETS = (.05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# Пространства имен ключей кэша: префикс или точный ключ -> метка
+CACHE_NAMESPACES = {
+    'fingerprint': 'fingerprint',
+    'lockout_until': 'lockout',
+    'login_attempts': 'lockout',
+    'session': 'session',
+    'membership': 'membership',
+    'admin': 'admin',
+    'db': 'db',
+}
+# Эндпоинты без метрик: статика и сам /metrics
+SKIP_ENDPOINTS = {'static', 'assets.asset', 'metrics.metrics'}
+# Длина текста запроса в медленном логе
+STATEMENT_LENGTH = 300
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'hotspot_request_duration_seconds', 'Request latency by endpoint',
+        ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+    )
+    REQUEST_QUERIES = Histogram(
+        'hotspot_request_db_queries', 'Database queries per request',
+        ['endpoint'], buckets=QUERY_BUCKETS
+    )
+    SMS_LATENCY = Histogram(
+        'hotspot_sms_send_duration_seconds', 'SMS send latency by gateway class',
+        ['gateway'], buckets=SMS_BUCKETS
+    )
+    SMS_ERRORS = Counter('hotspot_sms_send_errors_total', 'Failed SMS sends by gateway class', ['gateway'])
+    CACHE_REQUESTS = Counter('hotspot_cache_requests_total', 'Cache lookups by key namespace', ['namespace', 'result'])
+    OTP_VERIFICATIONS = Counter('hotspot_otp_verifications_total', 'OTP code checks by outcome', ['outcome'])
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+class RequestProfile:
+    """
+    Where the time of one request went: SQL, cache round trips and external calls.
+
+    Args:
+        max_statements (int): SQL statements kept for the slow log, 0 keeps only the totals.
+    """
+    __slots__ = ('started', 'queries', 'db_time', 'statements', 'max_statements',
+                 'cache_calls', 'cache_time', 'external_calls', 'external_time')
+
+    def __init__(self, max_statements=0):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = []
+        self.max_statements = max_statements
+        self.cache_calls = 0
+        self.cache_time = 0.0
+        self.external_calls = 0
+        self.external_time = 0.0
+
+    def add_query(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        if len(self.statements) < self.max_statements:
+            self.statements.append((duration, ' '.join(statement.split())[:STATEMENT_LENGTH]))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        return (
+            f'total {self.elapsed() * 1000:.1f} ms, '
+            f'db {self.queries} queries {self.db_time * 1000:.1f} ms, '
+            f'cache {self.cache_calls} calls {self.cache_time * 1000:.1f} ms, '
+            f'external {self.external_calls} calls {self.external_time * 1000:.1f} ms'
+        )
+
+    def server_timing(self) -> str:
+        """Breakdown in the `Server-Timing` header format shown by browser dev tools."""
+        return ', '.join((
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.1f}',
+            f'cache;desc="{self.cache_calls} calls";dur={self.cache_time * 1000:.1f}',
+            f'external;desc="{self.external_calls} calls";dur={self.external_time * 1000:.1f}',
+            f'total;dur={self.elapsed() * 1000:.1f}',
+        ))
+
+
+def current_profile() -> RequestProfile | None:
+    if has_request_context():
+        return g.get('_profile')
+    return None
+
+
+def cache_namespace(key) -> str:
+    """
+    Metric label for a cache key.
+
+    Example:
+        cache_namespace('fingerprint:5d41402a')  # 'fingerprint'
+        cache_namespace('flask_cache_<sid>:sms:otp')  # 'sms'
+    """
+    key = str(key)
+    if ':sms:' in key:
+        return 'sms'
+    return CACHE_NAMESPACES.get(key.split(':', 1)[0], 'other')
+
+
+def metrics_enabled() -> bool:
+    """Whether the current application collects metrics (`METRICS.enabled` and prometheus_client installed)."""
+    if prometheus_client is None or not has_app_context():
+        return False
+    return bool((current_app.config.get('METRICS') or {}).get('enabled'))
+
+
+def observe_cache(key, hit: bool, namespace=None):
+    if not metrics_enabled():
+        return
+    CACHE_REQUESTS.labels(namespace or cache_namespace(key), 'hit' if hit else 'miss').inc()
+
+
+def observe_sms(gateway: str, latency: float, error: bool):
+    if not metrics_enabled():
+        return
+    SMS_LATENCY.labels(gateway).observe(latency)
+    if error:
+        SMS_ERRORS.labels(gateway).inc()
+
+
+def observe_otp(outcome: str):
+    if not metrics_enabled():
+        return
+    OTP_VERIFICATIONS.labels(outcome).inc()
+
+
+def timed_cache(func, *args, **kwargs):
+    """
+    Call a cache operation and add its round trip to the request profile.
+
+    Example:
+        record = timed_cache(otp_store.get, session_id)
+    """
+    profile = current_profile()
+    if profile is None:
+        return func(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.cache_calls += 1
+        profile.cache_time += time.perf_counter() - started
+
+
+def timed_send(sender, recipient, message):
+    """
+    Send an SMS and record its latency and errors under the sender class.
+
+    Returns what `sender.send_sms` returns; exceptions are recorded and re-raised.
+
+    Example:
+        error = timed_send(current_app.config['SENDER'], '79990000000', 'Code: 1234')
+    """
+    started = time.perf_counter()
+    error = True
+    try:
+        error = bool(result := sender.send_sms(recipient, message))
+        return result
+    finally:
+        latency = time.perf_counter() - started
+        observe_sms(type(sender).__name__, latency, error)
+        if (profile := current_profile()) is not None:
+            profile.external_calls += 1
+            profile.external_time += latency
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    started = getattr(context, '_profile_started', None)
+    if profile is not None and started is not None:
+        profile.add_query(statement, time.perf_counter() - started)
+
+
+def _start_request():
+    profiling = current_app.config.get('PROFILING') or {}
+    max_statements = profiling.get('max_statements', 50) if profiling.get('enabled') else 0
+    g._profile = RequestProfile(max_statements)
+
+
+def _finish_request(response):
+    profile = g.get('_profile')
+    endpoint = request.endpoint or 'none'
+    if profile is None or endpoint in SKIP_ENDPOINTS:
+        return response
+
+    if metrics_enabled():
+        REQUEST_LATENCY.labels(endpoint, request.method, str(response.status_code)).observe(profile.elapsed())
+        REQUEST_QUERIES.labels(endpoint).observe(profile.queries)
+
+    profiling = current_app.config.get('PROFILING') or {}
+    if profiling.get('enabled'):
+        if profiling.get('header') and current_app.debug:
+            response.headers['Server-Timing'] = profile.server_timing()
+        slow_threshold = profiling.get('slow_threshold', 500)
+        if profile.elapsed() * 1000 >= slow_threshold:
+            statements = ''.join(
+                f'\n  {duration * 1000:8.1f} ms  {statement}' for duration, statement in profile.statements
+            )
+            logger.warning('Slow request %s %s: %s%s', request.method, request.path, profile.summary(), statements)
+    return response
+
+
+def _registry():
+    # Под gunicorn каждый воркер пишет метрики в PROMETHEUS_MULTIPROC_DIR, /metrics собирает их все
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    token = (current_app.config.get('METRICS') or {}).get('token')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(prometheus_client.generate_latest(_registry()), content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """
+    Register the request hooks for the enabled instrumentation.
+
+    `METRICS` adds Prometheus metrics and the `/metrics` endpoint, `PROFILING` records
+    each request's SQL, cache and external call time, logs requests slower than
+    `slow_threshold` milliseconds with their statements and, in debug mode with
+    `header` set, returns the breakdown in the `Server-Timing` header.
+    """
+    collect = (app.config.get('METRICS') or {}).get('enabled')
+    if collect and prometheus_client is None:
+        logging.warning('Metrics are enabled but prometheus_client is not installed (requirements-metrics.txt)')
+        collect = False
+    if not collect and not (app.config.get('PROFILING') or {}).get('enabled'):
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    if collect:
+        if not app.config['METRICS'].get('token'):
+            logging.warning('/metrics is served without a token, set HOTSPOT_METRICS_TOKEN')
+        app.register_blueprint(metrics_bp)
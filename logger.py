@@ -1,26 +1,148 @@
 # logger.py
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
 from logging import Logger, getLogger
-from flask import current_app, request, session
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import current_app, has_request_context, request, session
+
+# Формат gunicorn для запуска без него: flask run, CLI, sms_worker.py, тесты
+TEXT_FORMAT = '%(asctime)s [%(process)d] [%(levelname)s] %(message)s'
+TEXT_DATE_FORMAT = '[%Y-%m-%d %H:%M:%S %z]'
+
+
+class Lazy:
+    """
+    Deferred log argument: `func(*args)` runs only when the record is emitted.
+
+    Example:
+        logger.debug('Session data: %s', logger.Lazy(_log_masked_session))
+    """
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+    __repr__ = __str__
+
+
+def _log(level, msg, args, kwargs):
+    app_logger = current_app.logger
+    # Уровень проверяется до любой работы с сообщением и сессией
+    if not app_logger.isEnabledFor(level):
+        return
+    sess_id, endpoint = '', None
+    if has_request_context():
+        sess_id = session.get('_id') or ''
+        endpoint = request.endpoint
+    extra = kwargs.pop('extra', None) or {}
+    extra.update(session_id=sess_id[:8], endpoint=endpoint)
+    kwargs.setdefault('stacklevel', 3)
+    msg = str(msg)
+    if not args:
+        # Сообщение без аргументов выводится как есть, даже если в нем есть %
+        msg = msg.replace('%', '%%')
+    app_logger.log(level, f"[%s:%s] {msg}", sess_id[:8], endpoint, *args, extra=extra, **kwargs)
 
-def _format_msg(text):
-    sess_id = session.get('_id')
-    endpoint = request.endpoint
-    return f"[{sess_id[:8]}:{endpoint}] {text}"
 
 def debug(msg, *args, **kwargs):
-    current_app.logger.debug(_format_msg(msg), *args, **kwargs)
+    _log(logging.DEBUG, msg, args, kwargs)
 
 def info(msg, *args, **kwargs):
-    current_app.logger.info(_format_msg(msg), *args, **kwargs)
+    _log(logging.INFO, msg, args, kwargs)
 
 def warning(msg, *args, **kwargs):
-    current_app.logger.warning(_format_msg(msg), *args, **kwargs)
+    _log(logging.WARNING, msg, args, kwargs)
 
 def error(msg, *args, **kwargs):
-    current_app.logger.error(_format_msg(msg), *args, **kwargs)
+    _log(logging.ERROR, msg, args, kwargs)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the request fields added by the helpers above."""
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in ('session_id', 'endpoint'):
+            if getattr(record, field, None):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
 
-def configure_logger(logger: Logger):
+
+class DebugSamplingFilter(logging.Filter):
+    """Pass only a `rate` share of DEBUG records, other levels are never dropped."""
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+def _stop_listener(listener: QueueListener):
+    # Дописываем очередь до конца; повторная остановка ничего не делает
+    if listener._thread is not None:
+        listener.stop()
+
+
+def configure_logger(logger: Logger, log_format='text', debug_sample_rate=1.0):
+    """
+    Route the logger through a queue to a background writer thread.
+
+    Requests only format the message (evaluating `Lazy` arguments) and put the record
+    into the queue; gunicorn's handlers or a JSON stream handler write it from the
+    listener thread.
+
+    Args:
+        logger (Logger): Logger to configure.
+        log_format (str): `text` - gunicorn's handlers and format (stderr in the same format
+            outside gunicorn), `json` - JSON lines to stderr.
+        debug_sample_rate (float): Share of DEBUG records kept, from 0 to 1.
+    """
     gunicorn_error_logger = getLogger('gunicorn.error')
-    logger.handlers = gunicorn_error_logger.handlers
+    if log_format == 'json':
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(JsonFormatter())
+        handlers = [stream_handler]
+    else:
+        handlers = list(gunicorn_error_logger.handlers)
+        if not handlers:
+            # Вне gunicorn его логгер пуст - без своего обработчика записи терялись бы
+            stream_handler = logging.StreamHandler(sys.stderr)
+            stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT, TEXT_DATE_FORMAT))
+            handlers = [stream_handler]
+
+    # Перенастройка логгера останавливает прежний поток записи
+    previous = getattr(logger, '_queue_listener', None)
+    if previous is not None:
+        _stop_listener(previous)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    logger._queue_listener = listener
+
+    logger.handlers = [queue_handler]
     logger.setLevel(gunicorn_error_logger.level)
-    logger.propagate = False
\ No newline at end of file
+    logger.propagate = False
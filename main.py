@@ -1,8 +1,10 @@
 from app import create_app
+from app.sms.outbox import start_outbox_threads
 
 
 flask_app = create_app()
 
 
 if __name__ == '__main__':
+    start_outbox_threads(flask_app)
     flask_app.run(port=3000, debug=True)
@@ -0,0 +1,25 @@
+# purge_worker.py
+import logging
+import sys
+import time
+
+from app import create_app
+from app.database.purge import Purger
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(threadName)s] %(levelname)s %(message)s')
+
+flask_app = create_app()
+
+purge = flask_app.config.get('PURGE') or {}
+if not purge.get('enabled'):
+    logging.info("Purge of expired clients is not enabled. Exiting.")
+    sys.exit(0)
+
+purger = Purger.from_config(purge)
+while True:
+    try:
+        with flask_app.app_context():
+            purger.run()
+    except Exception:
+        logging.exception('Purge of expired clients failed')
+    time.sleep(purge['interval'])
@@ -0,0 +1,115 @@
+import re
+import secrets
+import time
+
+from flask.sessions import SecureCookieSession, SessionInterface
+
+from extensions import cache
+
+KEY_PREFIX = 'session:'
+SID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+
+
+class CacheSession(SecureCookieSession):
+    """
+    Session whose data lives in the cache, the cookie only carries its opaque id.
+
+    Args:
+        initial (dict): Stored session data.
+        sid (str): Session id from the cookie, a new one is generated if not set.
+        written_at (float): Time the data was last written to the cache.
+    """
+    def __init__(self, initial=None, sid=None, written_at=None):
+        super().__init__(initial)
+        self.new = sid is None
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.written_at = written_at
+        self.previous_sid = None
+
+    def regenerate(self):
+        """
+        Move the data to a new id and drop the old one, e.g. when the user logs in,
+        so that an id planted before the login is worthless afterwards.
+        """
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+def regenerate_session(session):
+    """Issue a new session id on a privilege change; signed cookie sessions need nothing."""
+    if isinstance(session, CacheSession):
+        session.regenerate()
+
+
+class CacheSessionInterface(SessionInterface):
+    """
+    Server-side sessions stored in `extensions.cache`.
+
+    The data is written lazily: only when the session was modified, or when half of its
+    lifetime has passed, so an active session does not expire. Guest sessions live as
+    long as the one-time code (`OTP_TTL`), permanent admin sessions for
+    `permanent_session_lifetime`. An emptied session is deleted together with its cookie.
+
+    Example:
+        app.session_interface = CacheSessionInterface()
+    """
+    session_class = CacheSession
+
+    @staticmethod
+    def _key(sid) -> str:
+        return f'{KEY_PREFIX}{sid}'
+
+    @staticmethod
+    def get_ttl(app, session) -> int:
+        if session.permanent:
+            return int(app.permanent_session_lifetime.total_seconds())
+        return int(app.config.get('OTP_TTL', 300))
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        # Подделанный или чужой id - начинаем новую сессию
+        if sid and SID_PATTERN.match(sid):
+            record = cache.get(self._key(sid))
+            if record is not None:
+                data, written_at = record
+                return self.session_class(data, sid=sid, written_at=written_at)
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        cookie_options = {
+            'domain': self.get_cookie_domain(app),
+            'path': self.get_cookie_path(app),
+            'secure': self.get_cookie_secure(app),
+            'partitioned': self.get_cookie_partitioned(app),
+            'samesite': self.get_cookie_samesite(app),
+            'httponly': self.get_cookie_httponly(app),
+        }
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.previous_sid:
+            cache.delete(self._key(session.previous_sid))
+
+        if not session:
+            if session.modified and not session.new:
+                cache.delete(self._key(session.sid))
+                response.delete_cookie(name, **cookie_options)
+                response.vary.add('Cookie')
+            return
+
+        ttl = self.get_ttl(app, session)
+        now = time.time()
+        stale = session.written_at is None or now - session.written_at > ttl / 2
+        if not session.modified and not stale:
+            return
+
+        cache.set(self._key(session.sid), (dict(session), now), timeout=ttl)
+        # Cookie меняется только у новой сессии и у постоянной, которой продлили срок
+        if session.new or session.permanent:
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session), **cookie_options)
+            response.vary.add('Cookie')
@@ -10,8 +10,14 @@ from app.sms.huawei import HuaweiSMSSender
 from app.sms.mikrotik import MikrotikSMSSender
 from app.sms.smsru import SMSRUSender
 from app.sms import DebugSender
+from app.sms.router import Gateway, RoutingSender
 import bcrypt
 
+from app.database.engine import engine_options
+from app.database.migrations import upgrade
+from app.database.sqlite import setup_sqlite
+from extensions import build_language_catalog
+
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
@@ -28,6 +34,12 @@ def convert_delay(delay):
     return timedelta(**{suffixes[suffix]: amount})
 
 
+def convert_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
 class Config:
     SETTINGS_FILE_PATH = "config/settings.yaml"
     LANGUAGE_FOLDER = "app/static/language"
@@ -61,26 +73,52 @@ class Config:
     CACHE_MEMCACHED_PASSWORD = None
     CACHE_MEMCACHED_SERVERS = None
     CACHE_DIR = None
+    # Одноразовые коды: время жизни, задержка повторной отправки и число попыток
+    OTP_TTL = 5 * 60
+    OTP_RESEND_DELAY = 60
+    OTP_MAX_ATTEMPTS = 3
+    # Кэш отрендеренных страниц портала в каждом воркере
+    PAGE_CACHE = True
+    PAGE_CACHE_SIZE = 256
     LANGUAGE_DEFAULT = None
     LANGUAGE_CONTENT = None
+    LANGUAGE_CATALOG = None
     SQLALCHEMY_DATABASE_URI = None
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_BINDS = {}
+    DB = None
     HOTSPOT_USERS = None
     COMPANY_NAME = None
     DEBUG = None
     SENDER = None
+    SMS_OUTBOX = None
+    PURGE = None
+    METRICS = None
+    PROFILING = None
+    ASSETS = None
+    SESSION_STORE = None
+    LOG_FORMAT = 'text'
+    LOG_DEBUG_SAMPLE_RATE = 1.0
+    USE_X_SENDFILE = False
 
     @classmethod
     def init_db(cls, app, db):
         cls.settings = cls.load_settings()
         cls.SQLALCHEMY_DATABASE_URI = os.environ.get('HOTSPOT_DB_URL', cls.settings.get('db_url', cls.DEFAULT_DB_URL))
+        cls.DB = cls.configure_db()
+        cls.SQLALCHEMY_ENGINE_OPTIONS = engine_options(cls.SQLALCHEMY_DATABASE_URI, cls.DB)
         app.config.from_object(cls)
 
         db.init_app(app)
 
         with app.app_context():
+            setup_sqlite(db.engine, cls.DB)
             db.create_all()
             logging.info("Database created.")
+            delays = {user_type: params['delay'] for user_type, params in cls.configure_hotspot_users().items()}
+            version = upgrade(db.engine, delays)
+            logging.info("Database schema is at version %s.", version)
 
     @classmethod
     def init_app(cls, app):
@@ -91,10 +129,21 @@ class Config:
         cls.LANGUAGE_CONTENT = cls.load_language_files()
         cls.configure_cache()
         cls.SQLALCHEMY_DATABASE_URI = os.environ.get('HOTSPOT_DB_URL', cls.settings.get('db_url', cls.DEFAULT_DB_URL))
+        cls.DB = cls.configure_db()
+        cls.SQLALCHEMY_ENGINE_OPTIONS = engine_options(cls.SQLALCHEMY_DATABASE_URI, cls.DB)
+        cls.SQLALCHEMY_BINDS = cls.configure_replica()
         cls.HOTSPOT_USERS = cls.configure_hotspot_users()
         cls.COMPANY_NAME = os.environ.get('HOTSPOT_COMPANY_NAME', cls.settings.get('company_name', cls.DEFAULT_COMPANY_NAME))
         cls.DEBUG = os.environ.get('DEBUG', cls.settings.get('debug', False))
         cls.SENDER = cls.configure_sms_sender()
+        cls.SMS_OUTBOX = cls.configure_sms_outbox()
+        cls.PURGE = cls.configure_purge()
+        cls.METRICS = cls.configure_metrics()
+        cls.PROFILING = cls.configure_profiling()
+        cls.ASSETS = cls.configure_assets()
+        cls.SESSION_STORE = cls.configure_session_store()
+        cls.LOG_FORMAT, cls.LOG_DEBUG_SAMPLE_RATE = cls.configure_logging()
+        cls.USE_X_SENDFILE = cls.ASSETS['x_sendfile']
 
         app.config.from_object(cls)
 
@@ -132,7 +181,7 @@ class Config:
             server = f"{parsed_url.hostname}:{parsed_url.port}"
             cls.CACHE_MEMCACHED_SERVERS = [server]
         elif scheme == 'file':
-            cls.CACHE_TYPE = "file"
+            cls.CACHE_TYPE = cls.CACHE_TYPES['file']
             cls.CACHE_DIR = parsed_url.path
         else:
             raise NotImplementedError(f"Not implemented cache {scheme}")
@@ -162,6 +211,8 @@ class Config:
                 language_name = os.path.splitext(filename)[0]
                 with open(file_path, "r", encoding='utf-8') as lang_file:
                     language_content[language_name] = json.load(lang_file)
+        # Плоский каталог переводов собирается один раз при старте
+        cls.LANGUAGE_CATALOG = build_language_catalog(language_content)
         return language_content
 
     @classmethod
@@ -188,6 +239,169 @@ class Config:
                 param_name = key[len('HOTSPOT_SENDER_'):].lower()
                 sender_params[param_name] = value
 
+        if sender_type == 'router':
+            return cls.configure_sms_router(sender_params)
+
         # Инициализация отправителя с универсальными параметрами
+        return cls.create_sender(sender_class, sender_params)
+
+    @staticmethod
+    def create_sender(sender_class, sender_params):
+        # Флаги из переменных окружения приходят строками: 'false' -> False
+        if 'persistent' in sender_params:
+            sender_params['persistent'] = convert_bool(sender_params['persistent'])
         return sender_class(**sender_params)
-        
\ No newline at end of file
+
+    @classmethod
+    def configure_sms_router(cls, router_params):
+        gateways = []
+        for number, gateway_config in enumerate(router_params.pop('gateways', None) or []):
+            gateway_params = {**gateway_config}
+            gateway_type = gateway_params.get('type')
+            name = gateway_params.pop('name', f'{gateway_type}-{number}')
+            weight = gateway_params.pop('weight', 1)
+            rate_limit = gateway_params.pop('rate_limit', None)
+            sender_class = cls.SMS_SENDERS.get(gateway_type, DebugSender)
+            gateways.append(Gateway(name, cls.create_sender(sender_class, gateway_params), weight, rate_limit))
+        return RoutingSender(gateways, **router_params)
+        
+    @classmethod
+    def configure_logging(cls):
+        log_settings = cls.settings.get('logging', {})
+        log_format = os.environ.get('HOTSPOT_LOG_FORMAT', log_settings.get('format', 'text'))
+        sample_rate = os.environ.get('HOTSPOT_LOG_DEBUG_SAMPLE_RATE', log_settings.get('debug_sample_rate', 1.0))
+        if log_format not in ('text', 'json'):
+            raise NotImplementedError(f"Not implemented log format {log_format}")
+        return log_format, min(max(float(sample_rate), 0.0), 1.0)
+
+    @classmethod
+    def configure_session_store(cls):
+        # cache - данные сессии в кэше, в cookie только id; cookie - подписанная cookie Flask
+        store = os.environ.get('HOTSPOT_SESSION_STORE', cls.settings.get('session_store', 'cache'))
+        if store not in ('cache', 'cookie'):
+            raise NotImplementedError(f"Not implemented session store {store}")
+        # SimpleCache живет в памяти каждого процесса: под gunicorn сессия терялась бы при переходе на другой воркер
+        if store == 'cache' and cls.CACHE_TYPE == cls.CACHE_TYPES['simple']:
+            logging.warning("cache_url 'simple' is local to each process, keeping sessions in signed cookies instead")
+            return 'cookie'
+        return store
+
+    @classmethod
+    def configure_assets(cls):
+        assets_settings = cls.settings.get('assets', {})
+        accel_redirect = os.environ.get('HOTSPOT_ASSETS_ACCEL_REDIRECT', assets_settings.get('accel_redirect'))
+        x_sendfile = os.environ.get('HOTSPOT_ASSETS_X_SENDFILE', assets_settings.get('x_sendfile', False))
+        return {
+            'accel_redirect': accel_redirect or None,
+            'x_sendfile': convert_bool(x_sendfile)
+        }
+
+    @classmethod
+    def configure_db(cls):
+        db_settings = cls.settings.get('db', {})
+
+        def option(name, convert):
+            value = os.environ.get(f'HOTSPOT_DB_{name.upper()}', db_settings.get(name))
+            return None if value is None or value == '' else convert(value)
+
+        # wal - WAL, busy_timeout, mmap и кэш страниц для SQLite; off - настройки SQLite по умолчанию
+        sqlite_mode = option('sqlite_mode', str) or 'wal'
+        if sqlite_mode not in ('wal', 'off'):
+            raise NotImplementedError(f"Not implemented sqlite mode {sqlite_mode}")
+        pool_pre_ping = option('pool_pre_ping', convert_bool)
+        replica_max_lag = option('replica_max_lag', float)
+        # 0 - допустимое значение (без ожидания блокировки, mmap выключен), поэтому без `or`
+        busy_timeout = option('busy_timeout', int)
+        mmap_size = option('mmap_size', int)
+        cache_size = option('cache_size', int)
+        return {
+            'sqlite_mode': sqlite_mode,
+            'busy_timeout': 5000 if busy_timeout is None else busy_timeout,
+            'mmap_size': 256 * 1024 * 1024 if mmap_size is None else mmap_size,
+            'cache_size': 64 * 1024 if cache_size is None else cache_size,
+            # Пул соединений PostgreSQL и MySQL в каждом воркере; None - значение SQLAlchemy по умолчанию
+            'pool_size': option('pool_size', int),
+            'max_overflow': option('max_overflow', int),
+            'pool_timeout': option('pool_timeout', float),
+            'pool_recycle': option('pool_recycle', int),
+            'pool_pre_ping': True if pool_pre_ping is None else pool_pre_ping,
+            'connect_timeout': option('connect_timeout', int),
+            'statement_timeout': option('statement_timeout', int),  # Миллисекунды
+            'isolation_level': option('isolation_level', str),
+            # Реплика пропускается, если отстает больше чем на replica_max_lag секунд
+            'replica_max_lag': 10.0 if replica_max_lag is None else replica_max_lag,
+            'replica_lag_check': option('replica_lag_check', int) or 5
+        }
+
+    @classmethod
+    def configure_replica(cls):
+        replica_url = os.environ.get('HOTSPOT_DB_REPLICA_URL', cls.settings.get('db_replica_url'))
+        if not replica_url:
+            return {}
+        return {'replica': {'url': replica_url, **engine_options(replica_url, cls.DB)}}
+
+    @classmethod
+    def configure_purge(cls):
+        purge_settings = cls.settings.get('purge', {})
+        enabled = os.environ.get('HOTSPOT_PURGE_ENABLED', purge_settings.get('enabled', False))
+        retention = os.environ.get('HOTSPOT_PURGE_RETENTION', purge_settings.get('retention', '30d'))
+        outbox_retention = os.environ.get('HOTSPOT_PURGE_OUTBOX_RETENTION', purge_settings.get('outbox_retention', '1d'))
+        interval = os.environ.get('HOTSPOT_PURGE_INTERVAL', purge_settings.get('interval', '1h'))
+        batch_size = os.environ.get('HOTSPOT_PURGE_BATCH_SIZE', purge_settings.get('batch_size', 500))
+        # Окно обслуживания HH:MM-HH:MM, вне его удаление не запускается
+        window = os.environ.get('HOTSPOT_PURGE_WINDOW', purge_settings.get('window'))
+        archive_dir = os.environ.get('HOTSPOT_PURGE_ARCHIVE_DIR', purge_settings.get('archive_dir'))
+        return {
+            'enabled': convert_bool(enabled),
+            'retention': convert_delay(str(retention)),
+            'outbox_retention': convert_delay(str(outbox_retention)),
+            'interval': convert_delay(str(interval)).total_seconds(),
+            'batch_size': int(batch_size),
+            'pause': float(purge_settings.get('pause', 0.1)),
+            'window': window or None,
+            'archive_dir': archive_dir or None
+        }
+
+    @classmethod
+    def configure_metrics(cls):
+        metrics_settings = cls.settings.get('metrics', {})
+        # По умолчанию выключены: /metrics раскрывает эндпоинты и нагрузку, включается явно и с токеном
+        enabled = os.environ.get('HOTSPOT_METRICS_ENABLED', metrics_settings.get('enabled', False))
+        token = os.environ.get('HOTSPOT_METRICS_TOKEN', metrics_settings.get('token'))
+        return {
+            'enabled': convert_bool(enabled),
+            'token': token or None
+        }
+
+    @classmethod
+    def configure_profiling(cls):
+        profiling_settings = cls.settings.get('profiling', {})
+        enabled = os.environ.get('HOTSPOT_PROFILING_ENABLED', profiling_settings.get('enabled', False))
+        # Миллисекунды: более медленные запросы пишутся в лог со списком SQL
+        slow_threshold = os.environ.get('HOTSPOT_PROFILING_SLOW_THRESHOLD', profiling_settings.get('slow_threshold', 500))
+        # Заголовок Server-Timing, только в режиме отладки
+        header = os.environ.get('HOTSPOT_PROFILING_HEADER', profiling_settings.get('header', False))
+        return {
+            'enabled': convert_bool(enabled),
+            'slow_threshold': float(slow_threshold),
+            'header': convert_bool(header),
+            'max_statements': int(profiling_settings.get('max_statements', 50))
+        }
+
+    @classmethod
+    def configure_sms_outbox(cls):
+        outbox_settings = cls.settings.get('sms_outbox', {})
+        enabled = os.environ.get('HOTSPOT_SMS_OUTBOX_ENABLED', outbox_settings.get('enabled', False))
+        mode = os.environ.get('HOTSPOT_SMS_OUTBOX_MODE', outbox_settings.get('mode', 'thread'))
+        workers = os.environ.get('HOTSPOT_SMS_OUTBOX_WORKERS', outbox_settings.get('workers', 2))
+        max_attempts = os.environ.get('HOTSPOT_SMS_OUTBOX_MAX_ATTEMPTS', outbox_settings.get('max_attempts', 5))
+        backoff = os.environ.get('HOTSPOT_SMS_OUTBOX_BACKOFF', outbox_settings.get('backoff', 2))
+        if mode not in ('thread', 'process'):
+            raise NotImplementedError(f"Not implemented sms outbox mode {mode}")
+        return {
+            'enabled': convert_bool(enabled),
+            'mode': mode,
+            'workers': int(workers),
+            'max_attempts': int(max_attempts),
+            'backoff': float(backoff)
+        }
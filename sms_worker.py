@@ -0,0 +1,26 @@
+# sms_worker.py
+import atexit
+import logging
+import os
+import sys
+
+from app import create_app
+from app.sms.outbox import OutboxWorker
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(threadName)s] %(levelname)s %(message)s')
+
+flask_app = create_app()
+
+sms_outbox = flask_app.config.get('SMS_OUTBOX') or {}
+if not sms_outbox.get('enabled') or sms_outbox.get('mode') != 'process':
+    logging.info("SMS outbox is not configured in process mode. Exiting.")
+    sys.exit(0)
+
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    # Метрики отправки попадают в общий каталог с воркерами gunicorn; при выходе процесс помечается завершенным
+    from prometheus_client import multiprocess
+    atexit.register(multiprocess.mark_process_dead, os.getpid())
+
+worker = OutboxWorker.from_config(flask_app, sms_outbox)
+worker.start()
+worker.join()
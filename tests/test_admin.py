@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 import unittest
 from unittest import mock
 from unittest.mock import patch
@@ -10,7 +11,10 @@ from flask import Flask, session
 # Add the root directory of the project to the sys.path
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, root_dir)
-from app.database.models import Blacklist, Employee
+import datetime
+import json
+
+from app.database.models import Blacklist, ClientsNumber, Employee, EmployeePhone, WifiClient
 from app.pages.admin import (
     admin_bp,
     _check_password,
@@ -19,7 +23,8 @@ from app.pages.admin import (
 )
 
 from app.database import db
-from extensions import get_translate
+from app.database.membership import is_blacklisted
+from extensions import get_translate, cache
 
 class TestAdminViews(unittest.TestCase):
     def setUp(self):
@@ -57,8 +62,10 @@ class TestAdminViews(unittest.TestCase):
         }
         self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['CACHE_TYPE'] = 'SimpleCache'
 
         db.init_app(self.app)
+        cache.init_app(self.app)
         @self.app.context_processor
         def inject_get_translate():
             return dict(get_translate=get_translate)
@@ -178,6 +185,161 @@ class TestAdminViews(unittest.TestCase):
                 response = c.post(f'/admin/delete/{table_name}', json=data)
                 self.assertEqual(response.status_code, 200)
 
+    def test_save_blacklist_invalidates_membership(self):
+        self.assertFalse(is_blacklisted('79990001122'))
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['is_authenticated'] = True
+            response = c.post('/admin/save/blacklist', json={'phone': '79990001122'})
+            self.assertEqual(response.status_code, 200)
+        self.assertTrue(is_blacklisted('79990001122'))
+    def _add_wifi_clients(self, count):
+        now = datetime.datetime.now()
+        for number in range(count):
+            phone = ClientsNumber(phone_number=f'7999000{number:04d}')
+            db.session.add(WifiClient(
+                mac=f'AA:BB:CC:00:{number // 256:02X}:{number % 256:02X}',
+                expiration=now,
+                employee=False,
+                login_at=now - datetime.timedelta(minutes=number % 5),
+                phone=phone
+            ))
+        db.session.commit()
+
+    def test_wifi_clients_search(self):
+        self._add_wifi_clients(30)
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['is_authenticated'] = True
+            response = c.get('/admin/table/wifi_clients?search=00:00:1A')
+            self.assertEqual([row['mac'] for row in response.json['data']], ['AA:BB:CC:00:00:1A'])
+
+            response = c.get('/admin/table/wifi_clients?search=+7 (999) 000-0012')
+            self.assertEqual([row['phone'] for row in response.json['data']], ['79990000012'])
+
+            response = c.get('/admin/table/wifi_clients?search=zz')
+            self.assertEqual(response.json['data'], [])
+
+    def test_wifi_clients_cursor(self):
+        self._add_wifi_clients(30)
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['is_authenticated'] = True
+            by_offset, by_cursor, cursor = [], [], None
+            for page in range(1, 4):
+                by_offset += c.get(f'/admin/table/wifi_clients?page={page}&rows_per_page=10').json['data']
+                query = f'&cursor={cursor}' if cursor else ''
+                response = c.get(f'/admin/table/wifi_clients?rows_per_page=10{query}').json
+                by_cursor += response['data']
+                cursor = response['next_cursor']
+                self.assertEqual(response['total_rows'], 30)
+
+            self.assertEqual(by_cursor, by_offset)
+            self.assertEqual(len({row['mac'] for row in by_cursor}), 30)
+            self.assertEqual(c.get('/admin/table/wifi_clients?cursor=broken').status_code, 400)
+
+    def test_wifi_clients_cursor_null_login_at(self):
+        self._add_wifi_clients(30)
+        # Клиенты, созданные до появления login_at
+        db.session.execute(db.update(WifiClient).where(WifiClient.id % 3 == 0).values(login_at=None))
+        db.session.commit()
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['is_authenticated'] = True
+            by_offset, by_cursor, cursor = [], [], None
+            for page in range(1, 5):
+                by_offset += c.get(f'/admin/table/wifi_clients?page={page}&rows_per_page=7').json['data']
+                query = f'&cursor={cursor}' if cursor else ''
+                response = c.get(f'/admin/table/wifi_clients?rows_per_page=7{query}').json
+                by_cursor += response['data']
+                cursor = response['next_cursor']
+            # Последняя страница целиком из строк с NULL
+            by_offset += c.get('/admin/table/wifi_clients?page=5&rows_per_page=7').json['data']
+            by_cursor += c.get(f'/admin/table/wifi_clients?rows_per_page=7&cursor={cursor}').json['data']
+
+            self.assertEqual(by_cursor, by_offset)
+            self.assertEqual(len({row['mac'] for row in by_cursor}), 30)
+
+    def test_export(self):
+        self._add_wifi_clients(3)
+        db.session.add(EmployeePhone(phone_number='79990001111', employee_id=1))
+        db.session.add(EmployeePhone(phone_number='79990002222', employee_id=1))
+        db.session.commit()
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['is_authenticated'] = True
+
+            with patch('app.pages.admin.EXPORT_BATCH_SIZE', 2):
+                response = c.get('/admin/export/wifi_clients')
+            self.assertEqual(response.mimetype, 'text/csv')
+            lines = response.data.decode().splitlines()
+            self.assertEqual(lines[0], 'mac,phone,expiration,employee,login_at')
+            self.assertEqual(len(lines), 4)
+            self.assertTrue(lines[1].startswith('AA:BB:CC:00:00:00,79990000000,'))
+
+            response = c.get('/admin/export/employee?format=ndjson')
+            self.assertEqual(
+                [json.loads(line) for line in response.data.decode().splitlines()],
+                [{'id': 1, 'lastname': 'Doe', 'name': 'John', 'phones': ['79990001111', '79990002222']}]
+            )
+
+            response = c.get('/admin/export/blacklist')
+            self.assertEqual(response.data.decode().splitlines(), ['phone', '1234567890'])
+            self.assertEqual(c.get('/admin/export/blacklist?format=xml').status_code, 400)
+
+    def test_import(self):
+        db.session.add(EmployeePhone(phone_number='79990001111', employee_id=1))
+        db.session.commit()
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['is_authenticated'] = True
+
+            csv_data = (
+                'lastname,name,phones\n'
+                'Smith,Anna,8 (999) 000-22-22;+79990003333\n'
+                'Brown,Bob,79990001111\n'
+                ',Nameless,79990004444\n'
+                'Green,Gus,79990003333\n'
+                'White,Walt,123\n'
+            )
+            response = c.post('/admin/import/employee', data=csv_data, content_type='text/csv')
+            self.assertEqual(response.json['imported'], 1)
+            self.assertEqual(response.json['errors'], [
+                {'row': 2, 'error': 'phone_exists', 'phone': '79990001111'},
+                {'row': 3, 'error': 'missing_name'},
+                {'row': 4, 'error': 'phone_exists', 'phone': '79990003333'},
+                {'row': 5, 'error': 'invalid_phone', 'phone': '123'},
+            ])
+            smith = Employee.query.filter_by(lastname='Smith').one()
+            self.assertEqual({phone.phone_number for phone in smith.phones}, {'79990002222', '79990003333'})
+
+            response = c.post('/admin/import/blacklist', json=['1234567890', '+7 999 000-55-55', {'phone': '79990005555'}])
+            self.assertEqual(response.json['imported'], 1)
+            self.assertEqual([error['row'] for error in response.json['errors']], [1, 3])
+            self.assertTrue(is_blacklisted('79990005555'))
+
+            self.assertEqual(c.post('/admin/import/blacklist', json={'phone': '1'}).status_code, 400)
+            self.assertEqual(c.post('/admin/import/wifi_clients', json=[]).status_code, 404)
+
+    def test_pool_stats(self):
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['is_authenticated'] = True
+            response = c.get('/admin/pool')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('status', response.json)
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'blacklist.json')
+            with open(path, 'w') as f:
+                json.dump(['79990006666', 'bad'], f)
+            result = self.app.test_cli_runner().invoke(args=['admin', 'import', 'blacklist', path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Imported 1 rows, 1 rejected', result.output)
+        self.assertIsNotNone(db.session.get(Blacklist, '79990006666'))
+
+
 if __name__ == '__main__':
     unittest.main()
     
\ No newline at end of file
@@ -0,0 +1,70 @@
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from flask import Flask, render_template_string
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.assets import assets_bp, asset_url, asset_urls
+from build_assets import build, minify_css
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.static_folder = os.path.join(tempfile.mkdtemp(), 'static')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.static_folder))
+        shutil.copytree(os.path.join(root_dir, 'app', 'static'), self.static_folder,
+                        ignore=shutil.ignore_patterns('dist'))
+        self.manifest = build(self.static_folder)
+
+        self.app = Flask(__name__, static_folder=self.static_folder)
+        self.app.add_template_global(asset_url)
+        self.app.add_template_global(asset_urls)
+        self.client = self.app.test_client()
+
+    def test_minify_css(self):
+        self.assertEqual(minify_css('/* c */\n.a > .b {\n  color: red;\n}\n'), '.a>.b{color:red}')
+
+    def test_source_files_without_route(self):
+        with self.app.test_request_context('/'):
+            self.assertEqual(asset_urls('error.css'), ['/static/style/buttons.css', '/static/style/notifications.css'])
+
+    def test_fingerprinted_bundle(self):
+        self.app.register_blueprint(assets_bp)
+        with self.app.test_request_context('/'):
+            url = render_template_string("{{ asset_urls('portal.css')[0] }}")
+        self.assertEqual(url, f"/assets/{self.manifest['portal.css']}")
+
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertTrue(response.mimetype.startswith('text/css'))
+        self.assertIn(b'.btn{', gzip.decompress(response.data))
+        response.close()
+
+        response = self.client.get(url)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn(b'.btn{', response.data)
+        response.close()
+
+    def test_accel_redirect(self):
+        self.app.register_blueprint(assets_bp)
+        self.app.config['ASSETS'] = {'accel_redirect': '/protected-assets/'}
+        built_name = self.manifest['tables.js']
+
+        response = self.client.get(f'/assets/{built_name}', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/protected-assets/{built_name}.gz')
+        self.assertEqual(response.data, b'')
+
+        self.assertEqual(self.client.get('/assets/missing.js').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
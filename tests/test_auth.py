@@ -1,9 +1,10 @@
 import datetime
 import os
 import sys
+import time
 import unittest
 from unittest.mock import patch, MagicMock
-from flask import Flask
+from flask import Flask, render_template
 from sqlalchemy import select
 
 from extensions import get_translate, cache
@@ -17,8 +18,12 @@ from app.pages.auth import (
     _octal_string_to_bytes,
     _check_employee,
 )
+from app.database.authorization import resolve_authorization
+from app.database.membership import MembershipIndex
+from app.otp import get_otp_store
 
 from app.database import db
+from app.pages.error import error_bp
 
 class TestAuthViews(unittest.TestCase):
     def setUp(self):
@@ -137,11 +142,52 @@ class TestAuthViews(unittest.TestCase):
     def test_octal_string_to_bytes(self):
         self.assertEqual(_octal_string_to_bytes("\\141\\142\\143"), b'abc')
 
+    def test_get_translate(self):
+        self.app.config['LANGUAGE_CONTENT']['en']['errors']['http'] = {'404': {'name': 'Not Found'}}
+        with self.app.test_request_context('/', headers={'Accept-Language': 'ru'}):
+            self.assertEqual(get_translate('html.login.title'), 'Title')
+            self.assertEqual(get_translate('errors.http."404".name'), 'Not Found')
+            self.assertEqual(get_translate('html.missing', 'Fallback'), 'Fallback')
+            self.assertEqual(get_translate('html.login'), 'html.login')
+
     def test_check_employee(self):
         with self.app.app_context():
             self.assertTrue(_check_employee('79999999999'))
             self.assertFalse(_check_employee('0987654321'))
 
+    def test_resolve_authorization(self):
+        authz = resolve_authorization(mac='12:34:56:78:9A:BC')
+        self.assertEqual(authz.phone, '79999999999')
+        self.assertEqual(authz.client_phone, '79999999999')
+        self.assertTrue(authz.employee)
+        self.assertTrue(authz.client_employee)
+        self.assertTrue(authz.is_active)
+        self.assertFalse(authz.blacklisted)
+
+        authz = resolve_authorization(mac='12:34:56:78:9A:BC', phone='79999999123')
+        self.assertEqual(authz.client_phone, '79999999999')
+        self.assertTrue(authz.blacklisted)
+        self.assertFalse(authz.employee)
+        self.assertIsNone(authz.phone_id)
+
+        authz = resolve_authorization(mac='00:00:00:00:00:00', phone='79999999321')
+        self.assertIsNone(authz.client_id)
+        self.assertIsNotNone(authz.phone_id)
+        self.assertFalse(authz.is_active)
+
+    def test_membership_index_version(self):
+        index = MembershipIndex(check_interval=0)
+        self.assertTrue(index.is_blacklisted('79999999123'))
+        self.assertFalse(index.is_blacklisted('79999999321'))
+
+        db.session.add(Blacklist(phone_number='79999999321'))
+        db.session.commit()
+        # Без смены версии используется построенный ранее индекс
+        self.assertFalse(index.is_blacklisted('79999999321'))
+
+        cache.set(MembershipIndex.VERSION_KEY, 'changed')
+        self.assertTrue(index.is_blacklisted('79999999321'))
+
     def test_login_route(self):
         test_init_data = {
             'chap-id': '1', 
@@ -179,9 +225,10 @@ class TestAuthViews(unittest.TestCase):
             response = c.post('/login')
             self.assertEqual(response.status_code, 200)
 
-    @patch('app.pages.auth._check_employee')
-    def test_login_route_bad_emp(self, mock_chck):
-        mock_chck.return_value = False
+    def test_login_route_bad_emp(self):
+        # Номер больше не принадлежит сотруднику, а клиент помечен как сотрудник
+        EmployeePhone.query.filter_by(phone_number='79999999999').delete()
+        db.session.commit()
         test_init_data = {
             'chap-id': '1', 
             'chap-challenge': 'challenge', 
@@ -316,7 +363,7 @@ class TestAuthViews(unittest.TestCase):
 
     def test_resend_route_cache_code(self):
         session_id = 'a' * 8
-        cache.set(f'{session_id}:sms:code', '1234')
+        get_otp_store().issue(session_id, '1234', attempts=1, resend_delay=0)
 
         mock_sender = MagicMock()
         mock_sender.send_sms.return_value = None
@@ -330,6 +377,21 @@ class TestAuthViews(unittest.TestCase):
             mock_sender.send_sms.assert_called_once_with('79999999999', 'Your code is 1234')
             
             self.assertEqual(response.status_code, 200)
+            self.assertEqual(get_otp_store().get(session_id).attempts, 1)
+            self.assertGreater(get_otp_store().get(session_id).resend_at, time.time())
+
+    @patch('app.pages.auth.randint', return_value=9876)
+    def test_code_route_outbox(self, _):
+        self.app.config['SMS_OUTBOX'] = {'enabled': True}
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['mac'] = '00:00:00:00:00:00'
+            response = c.post('/code', data={'phone': '71234567890'})
+            self.assertEqual(response.status_code, 200)
+            self.app.config['SENDER'].send_sms.assert_not_called()
+
+            response = c.get('/code/status')
+            self.assertEqual(response.json['status'], 'pending')
 
     @patch('app.pages.auth.randint', return_value=9876)
     def test_resend_route_rnd_code(self, _):
@@ -346,7 +408,7 @@ class TestAuthViews(unittest.TestCase):
     
     def test_resend_route_sended(self):
         session_id = 'a' * 8
-        cache.set(f'{session_id}:sms:sended', True)
+        get_otp_store().issue(session_id, '1234')
         with self.client as c:
             with c.session_transaction() as sess:
                 sess['_id'] = session_id
@@ -354,25 +416,28 @@ class TestAuthViews(unittest.TestCase):
             response = c.post('/resend')
             self.assertEqual(response.status_code, 400)
 
-    @patch('app.pages.auth.cache')
-    def test_auth_route(self, mock_cache):
+    def test_auth_route(self):
+        session_id = 'a' * 8
         test_init_data = {'code': '1234'}
-        mock_cache.get.return_value = '1234'
+        get_otp_store().issue(session_id, '1234')
         with self.client as c:
             with c.session_transaction() as sess:
+                sess['_id'] = session_id
                 sess['mac'] = '00:00:00:00:00:00'
                 sess['phone'] = '71234567890'
             response = c.post('/auth', data=test_init_data)
             self.assertEqual(response.status_code, 302)
             self.assertIn('/sendin', response.location)
+            self.assertIsNone(get_otp_store().get(session_id))
 
-    @patch('app.pages.auth.cache')
-    def test_auth_route_update_client(self, mock_cache):
+    def test_auth_route_update_client(self):
+        session_id = 'a' * 8
         test_init_data = {'code': '1234'}
-        mock_cache.get.return_value = '1234'
+        get_otp_store().issue(session_id, '1234')
         from app.database.models import WifiClient
         with self.client as c:
             with c.session_transaction() as sess:
+                sess['_id'] = session_id
                 sess['mac'] = '12:34:56:78:9A:BC'
                 sess['phone'] = '71234567890'
             
@@ -392,8 +457,7 @@ class TestAuthViews(unittest.TestCase):
     def test_auth_route_bad_code(self):
         session_id = 'a' * 8
         test_init_data = {'code': '1234'}
-        cache.set(f'{session_id}:sms:code', 5678)
-        cache.set(f'{session_id}:sms:attempts', 0)
+        get_otp_store().issue(session_id, '5678')
         expected_responses = [
             (307, '/code'),
             (307, '/code'),
@@ -617,5 +681,55 @@ class TestAuthViews(unittest.TestCase):
             self.assertEqual(response.status_code, 200)
 
 
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.register_blueprint(auth_bp)
+        self.app.register_blueprint(error_bp)
+        self.app.root_path = os.path.join(root_dir, 'app')
+        self.app.config['SECRET_KEY'] = 'secret'
+        self.app.config['COMPANY_NAME'] = 'Company'
+        self.app.config['LANGUAGE_DEFAULT'] = 'en'
+        self.app.config['LANGUAGE_CONTENT'] = {'en': {'sms_code': 'Your code is {code}'}}
+        self.app.config['CACHE_TYPE'] = 'SimpleCache'
+        self.app.config['SENDER'] = MagicMock(**{'send_sms.return_value': None})
+        cache.init_app(self.app)
+
+        @self.app.context_processor
+        def inject_get_translate():
+            return dict(get_translate=get_translate)
+        self.client = self.app.test_client()
+
+    def test_code_page_revalidation(self):
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess['phone'] = '71234567890'
+            with patch('extensions.render_template', wraps=render_template) as render:
+                response = c.get('/code')
+                self.assertEqual(response.status_code, 200)
+                etag = response.headers['ETag']
+                self.assertIn('Last-Modified', response.headers)
+
+                response = c.get('/code')
+                self.assertEqual(response.headers['ETag'], etag)
+                render.assert_called_once()
+
+            response = c.get('/code', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+
+    def test_error_page(self):
+        response = self.client.get('/missing')
+        self.assertEqual(response.status_code, 404)
+        etag = response.headers['ETag']
+
+        response = self.client.get('/missing', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get('/missing', headers={'Accept-Language': 'ru'})
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertIn('Accept-Language', response.headers['Vary'])
+
+
 if __name__ == '__main__':
     unittest.main()
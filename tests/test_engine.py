@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy import create_engine, text
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.database.engine import TimedQueuePool, engine_options, pool_stats
+
+
+class TestEngineOptions(unittest.TestCase):
+    def test_sqlite_keeps_defaults(self):
+        self.assertEqual(engine_options('sqlite:///:memory:', {'pool_size': 10}), {})
+
+    def test_postgres(self):
+        options = engine_options('postgresql://hotspot@db/hotspot', {
+            'pool_size': 10, 'max_overflow': 0, 'pool_recycle': None,
+            'connect_timeout': 3, 'statement_timeout': 5000, 'isolation_level': 'READ COMMITTED'
+        })
+        self.assertIs(options.pop('poolclass'), TimedQueuePool)
+        self.assertEqual(options, {
+            'pool_pre_ping': True,
+            'pool_size': 10,
+            'max_overflow': 0,
+            'isolation_level': 'READ COMMITTED',
+            'connect_args': {'connect_timeout': 3, 'options': '-c statement_timeout=5000'}
+        })
+
+    def test_mysql(self):
+        options = engine_options('mysql+pymysql://hotspot@db/hotspot', {
+            'pool_pre_ping': False, 'pool_recycle': 280, 'statement_timeout': 2000
+        })
+        self.assertFalse(options['pool_pre_ping'])
+        self.assertEqual(options['pool_recycle'], 280)
+        self.assertEqual(options['connect_args'], {'init_command': 'SET SESSION max_execution_time=2000'})
+
+    def test_mariadb(self):
+        options = engine_options('mariadb+pymysql://hotspot@db/hotspot', {'statement_timeout': 2500})
+        self.assertEqual(options['connect_args'], {'init_command': 'SET SESSION max_statement_time=2.5'})
+
+
+class TestTimedQueuePool(unittest.TestCase):
+    def test_checkout_wait(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(
+                f"sqlite:///{os.path.join(tmp, 'hotspot.db')}",
+                poolclass=TimedQueuePool, pool_size=1, max_overflow=0
+            )
+            held = engine.connect()
+            released = threading.Timer(0.2, held.close)
+            released.start()
+            # Второе соединение ждет, пока первое не вернется в пул
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            released.join()
+
+            stats = pool_stats(engine)
+            self.assertEqual(stats['checkouts'], 2)
+            self.assertEqual(stats['size'], 1)
+            self.assertGreaterEqual(stats['wait_max'], 0.1)
+
+            engine.dispose()
+            self.assertEqual(pool_stats(engine)['checkouts'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
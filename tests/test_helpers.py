@@ -0,0 +1,105 @@
+import os
+import re
+import sys
+import unittest
+from hashlib import md5
+
+try:
+    from hypothesis import example, given, strategies as st
+except ImportError:
+    raise unittest.SkipTest('hypothesis is not installed (requirements-dev.txt)')
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.pages.auth import OCTAL_BYTES, _chap_password, _mask_mac, _mask_phone, _octal_string_to_bytes
+from extensions import normalize_phone
+
+
+# Прежние реализации: оптимизированные помощники должны вести себя так же
+def reference_octal_string_to_bytes(oct_string):
+    if not oct_string:
+        return b''
+    byte_nums = []
+    for octal_num in oct_string.split("\\")[1:]:
+        decimal_value = 0
+        for i in range(len(octal_num)):
+            decimal_value += int(octal_num[-(i + 1)]) * 8 ** i
+        byte_nums.append(decimal_value)
+    return bytes(byte_nums)
+
+
+def reference_normalize_phone(phone_number):
+    if not phone_number:
+        return ''
+    num = re.sub(r'\D', '', phone_number)
+    num = re.sub(r'^8', '7', num)
+    if num.startswith('07'):
+        num = '7' + num[2:]
+    return num
+
+
+def reference_mask_mac(mac):
+    parts = mac.split(':')
+    return 'XX:XX:XX:' + ':'.join(parts[3:])
+
+
+def outcome(func, *args):
+    """Result or exception type, so that failing inputs must fail the same way."""
+    try:
+        return 'ok', func(*args)
+    except Exception as e:
+        return 'error', type(e)
+
+
+octal_parts = st.lists(st.text(alphabet='0123456789', max_size=4), max_size=20)
+chap_strings = st.lists(st.integers(0, 255), max_size=16).map(lambda values: ''.join(f'\\{v:03o}' for v in values))
+phones = st.from_regex(r'\+?[78]?[ ()\-0-9]{0,16}', fullmatch=True)
+macs = st.lists(st.text(alphabet='0123456789abcdefABCDEF', min_size=2, max_size=2), max_size=8).map(':'.join)
+
+
+class TestHelperEquivalence(unittest.TestCase):
+    @given(st.text(max_size=8), octal_parts)
+    @example('', ['141', '142', '143'])
+    @example('', ['', '7', '89', '400'])
+    def test_octal_string_to_bytes_digits(self, prefix, parts):
+        oct_string = prefix + ''.join(f'\\{part}' for part in parts)
+        self.assertEqual(outcome(_octal_string_to_bytes, oct_string), outcome(reference_octal_string_to_bytes, oct_string))
+
+    def test_octal_bytes_table(self):
+        for octal_num, value in OCTAL_BYTES.items():
+            self.assertEqual(reference_octal_string_to_bytes(f'\\{octal_num}'), bytes([value]))
+
+    @given(st.text())
+    @example('\\١٢')
+    @example('\\1_0')
+    @example('\\ 7')
+    def test_octal_string_to_bytes_any_text(self, oct_string):
+        self.assertEqual(outcome(_octal_string_to_bytes, oct_string), outcome(reference_octal_string_to_bytes, oct_string))
+
+    @given(chap_strings, chap_strings, st.text(max_size=16))
+    def test_chap_password(self, chap_id, chap_challenge, password):
+        expected = md5(
+            reference_octal_string_to_bytes(chap_id) + password.encode() + reference_octal_string_to_bytes(chap_challenge)
+        ).hexdigest()
+        self.assertEqual(_chap_password(chap_id, chap_challenge, password), expected)
+
+    @given(st.one_of(phones, st.text()))
+    @example('8 (999) 123-45-67')
+    @example('٨٩٩٩')
+    def test_normalize_phone(self, phone_number):
+        self.assertEqual(normalize_phone(phone_number), reference_normalize_phone(phone_number))
+
+    @given(st.one_of(macs, st.text()))
+    def test_mask_mac(self, mac):
+        self.assertEqual(_mask_mac(mac), reference_mask_mac(mac))
+
+    @given(st.text(min_size=4))
+    def test_mask_phone(self, phone):
+        masked = _mask_phone(phone)
+        self.assertEqual(len(masked), len(phone))
+        self.assertEqual(masked[-4:], phone[-4:])
+
+
+if __name__ == '__main__':
+    unittest.main()
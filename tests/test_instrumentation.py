@@ -0,0 +1,183 @@
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+from flask import Flask
+from sqlalchemy import select
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+import instrumentation
+from app.database import db
+from app.database.models import Blacklist
+from app.otp import get_otp_store
+from app.pages.auth import auth_bp
+from extensions import cache
+
+
+@unittest.skipIf(instrumentation.prometheus_client is None, 'prometheus_client is not installed')
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.register_blueprint(auth_bp)
+        self.app.config['SECRET_KEY'] = 'secret'
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['CACHE_TYPE'] = 'SimpleCache'
+        self.app.config['LANGUAGE_DEFAULT'] = 'en'
+        self.app.config['LANGUAGE_CONTENT'] = {'en': {'errors': {'auth': {'bad_code_try': 'Incorrect code'}}}}
+        self.app.config['METRICS'] = {'enabled': True, 'token': 'metrics-token'}
+
+        @self.app.route('/blacklist')
+        def blacklist():
+            db.session.execute(select(Blacklist)).all()
+            db.session.execute(select(Blacklist.phone_number)).all()
+            return 'ok'
+
+        db.init_app(self.app)
+        cache.init_app(self.app)
+        instrumentation.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+        self.client = self.app.test_client()
+
+    @staticmethod
+    def _sample(name, **labels):
+        return instrumentation.prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_cache_namespace(self):
+        self.assertEqual(instrumentation.cache_namespace('fingerprint:abc'), 'fingerprint')
+        self.assertEqual(instrumentation.cache_namespace('flask_cache_sid:sms:otp'), 'sms')
+        self.assertEqual(instrumentation.cache_namespace('lockout_until'), 'lockout')
+        self.assertEqual(instrumentation.cache_namespace('login_attempts'), 'lockout')
+        self.assertEqual(instrumentation.cache_namespace('unknown'), 'other')
+
+    def test_request_latency_and_queries(self):
+        before = self._sample('hotspot_request_db_queries_sum', endpoint='blacklist')
+        self.assertEqual(self.client.get('/blacklist').status_code, 200)
+
+        self.assertEqual(self._sample('hotspot_request_db_queries_sum', endpoint='blacklist') - before, 2)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer metrics-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'hotspot_request_duration_seconds_count{endpoint="blacklist",method="GET",status="200"}',
+            response.data.decode()
+        )
+
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+
+    def test_cache_hits(self):
+        with self.app.app_context():
+            before_miss = self._sample('hotspot_cache_requests_total', namespace='fingerprint', result='miss')
+            before_hit = self._sample('hotspot_cache_requests_total', namespace='fingerprint', result='hit')
+            cache.get('fingerprint:abc')
+            cache.set('fingerprint:abc', '02:00:00:00:00:01')
+            cache.get('fingerprint:abc')
+        self.assertEqual(self._sample('hotspot_cache_requests_total', namespace='fingerprint', result='miss'),
+                         before_miss + 1)
+        self.assertEqual(self._sample('hotspot_cache_requests_total', namespace='fingerprint', result='hit'),
+                         before_hit + 1)
+
+    def test_sms_send(self):
+        sender = MagicMock()
+        sender.send_sms.side_effect = [None, 1, RuntimeError('gateway down')]
+        gateway = type(sender).__name__
+        before_count = self._sample('hotspot_sms_send_duration_seconds_count', gateway=gateway)
+        before_errors = self._sample('hotspot_sms_send_errors_total', gateway=gateway)
+
+        with self.app.app_context():
+            self.assertIsNone(instrumentation.timed_send(sender, '79990000001', 'Code: 1234'))
+            self.assertEqual(instrumentation.timed_send(sender, '79990000001', 'Code: 1234'), 1)
+            with self.assertRaises(RuntimeError):
+                instrumentation.timed_send(sender, '79990000001', 'Code: 1234')
+
+        self.assertEqual(self._sample('hotspot_sms_send_duration_seconds_count', gateway=gateway), before_count + 3)
+        self.assertEqual(self._sample('hotspot_sms_send_errors_total', gateway=gateway), before_errors + 2)
+
+    def test_disabled(self):
+        self.app.config['METRICS'] = {'enabled': False}
+        before = self._sample('hotspot_cache_requests_total', namespace='fingerprint', result='miss')
+        before_sms = self._sample('hotspot_sms_send_duration_seconds_count', gateway='Disabled')
+        with self.app.app_context():
+            cache.get('fingerprint:disabled')
+            instrumentation.observe_sms('Disabled', 0.1, error=False)
+        self.assertEqual(self._sample('hotspot_cache_requests_total', namespace='fingerprint', result='miss'), before)
+        self.assertEqual(self._sample('hotspot_sms_send_duration_seconds_count', gateway='Disabled'), before_sms)
+
+    def test_otp_outcomes(self):
+        before_bad = self._sample('hotspot_otp_verifications_total', outcome='bad')
+        before_expired = self._sample('hotspot_otp_verifications_total', outcome='expired')
+        with self.client.session_transaction() as sess:
+            sess['_id'] = 'metrics-session'
+            sess['mac'] = '02:00:00:00:00:01'
+            sess['phone'] = '79990000001'
+
+        # Кода нет - истек
+        self.client.post('/auth', data={'code': '1234'})
+        with self.app.app_context():
+            get_otp_store().issue('metrics-session', '4321')
+        self.client.post('/auth', data={'code': '1234'})
+
+        self.assertEqual(self._sample('hotspot_otp_verifications_total', outcome='expired'), before_expired + 1)
+        self.assertEqual(self._sample('hotspot_otp_verifications_total', outcome='bad'), before_bad + 1)
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.debug = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['CACHE_TYPE'] = 'SimpleCache'
+        self.app.config['PROFILING'] = {'enabled': True, 'slow_threshold': 0, 'header': True, 'max_statements': 1}
+        self.sender = MagicMock()
+        self.sender.send_sms.return_value = None
+
+        @self.app.route('/login')
+        def login():
+            db.session.execute(select(Blacklist)).all()
+            db.session.execute(select(Blacklist.phone_number)).all()
+            cache.set('fingerprint:abc', '02:00:00:00:00:01')
+            cache.get('fingerprint:abc')
+            instrumentation.timed_send(self.sender, '79990000001', 'Code: 1234')
+            return 'ok'
+
+        db.init_app(self.app)
+        cache.init_app(self.app)
+        instrumentation.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+        self.client = self.app.test_client()
+
+    def test_breakdown_header(self):
+        with self.assertLogs(self.app.logger, 'WARNING'):
+            response = self.client.get('/login')
+        timing = response.headers['Server-Timing']
+        self.assertIn('db;desc="2 queries"', timing)
+        self.assertIn('cache;desc="2 calls"', timing)
+        self.assertIn('external;desc="1 calls"', timing)
+
+    def test_header_only_in_debug(self):
+        self.app.debug = False
+        with self.assertLogs(self.app.logger, 'WARNING'):
+            self.assertNotIn('Server-Timing', self.client.get('/login').headers)
+
+    def test_slow_log(self):
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.client.get('/login')
+        message = logs.output[0]
+        self.assertIn('Slow request GET /login', message)
+        self.assertIn('db 2 queries', message)
+        # В лог попадает не больше max_statements запросов
+        self.assertEqual(message.count('SELECT'), 1)
+
+    def test_fast_request_not_logged(self):
+        self.app.config['PROFILING'] = {'enabled': True, 'slow_threshold': 60000}
+        with self.assertNoLogs(self.app.logger, 'WARNING'):
+            self.assertEqual(self.client.get('/login').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import logging
+import os
+import sys
+import unittest
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from flask import Flask, session
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+import logger
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SECRET_KEY'] = 'secret'
+        self.handler = _ListHandler()
+        gunicorn_logger = logging.getLogger('gunicorn.error')
+        gunicorn_logger.addHandler(self.handler)
+        self.addCleanup(gunicorn_logger.setLevel, gunicorn_logger.level)
+        gunicorn_logger.setLevel(logging.INFO)
+        self.addCleanup(gunicorn_logger.removeHandler, self.handler)
+        logger.configure_logger(self.app.logger)
+        self.addCleanup(logger._stop_listener, self.app.logger._queue_listener)
+
+    def _flush(self):
+        logger._stop_listener(self.app.logger._queue_listener)
+
+    def test_lazy_argument(self):
+        masker = MagicMock(return_value='*******9999')
+        with self.app.test_request_context('/'):
+            session['_id'] = 'abcdef0123456789'
+            logger.debug('User phone: %s', logger.Lazy(masker, '79999999999'))
+            masker.assert_not_called()
+
+            logger.info('User phone: %s', logger.Lazy(masker, '79999999999'))
+            logger.info('100% done')
+        self._flush()
+
+        masker.assert_called_once_with('79999999999')
+        messages = [record.getMessage() for record in self.handler.records]
+        self.assertEqual(messages, ['[abcdef01:None] User phone: *******9999', '[abcdef01:None] 100% done'])
+
+    def test_stderr_without_gunicorn(self):
+        app = Flask('standalone')
+        gunicorn_logger = logging.getLogger('gunicorn.error')
+        with patch.object(gunicorn_logger, 'handlers', []), patch('sys.stderr', new_callable=StringIO) as stderr:
+            logger.configure_logger(app.logger)
+            app.logger.warning('SMS gateway is down')
+            logger._stop_listener(app.logger._queue_listener)
+        self.assertIn('[WARNING] SMS gateway is down', stderr.getvalue())
+
+    def test_json_formatter(self):
+        record = logging.LogRecord('app', logging.INFO, __file__, 1, 'SMS %s sent', ('42',), None)
+        record.session_id = 'abcdef01'
+        entry = json.loads(logger.JsonFormatter().format(record))
+        self.assertEqual(entry['message'], 'SMS 42 sent')
+        self.assertEqual(entry['session_id'], 'abcdef01')
+        self.assertEqual(entry['level'], 'INFO')
+
+    def test_debug_sampling(self):
+        sampler = logger.DebugSamplingFilter(0)
+        debug = logging.LogRecord('app', logging.DEBUG, __file__, 1, 'debug', None, None)
+        error = logging.LogRecord('app', logging.ERROR, __file__, 1, 'error', None, None)
+        self.assertFalse(sampler.filter(debug))
+        self.assertTrue(sampler.filter(error))
+        self.assertTrue(logger.DebugSamplingFilter(1).filter(debug))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, inspect, text
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.database import db
+from app.database.migrations import MIGRATIONS, upgrade
+
+# Схема до появления миграций
+OLD_SCHEMA = [
+    "CREATE TABLE clients_number (id INTEGER PRIMARY KEY, phone_number VARCHAR(20) UNIQUE, last_seen DATETIME)",
+    "CREATE TABLE wifi_client (id INTEGER PRIMARY KEY, mac VARCHAR(17) UNIQUE, expiration DATETIME, "
+    "employee BOOLEAN, phone_id INTEGER REFERENCES clients_number(id))",
+    "CREATE TABLE employee (id INTEGER PRIMARY KEY, lastname VARCHAR(50) NOT NULL, name VARCHAR(50) NOT NULL)",
+    "CREATE TABLE employee_phone (phone_number VARCHAR(20) PRIMARY KEY, "
+    "employee_id INTEGER NOT NULL REFERENCES employee(id))",
+    "INSERT INTO clients_number (id, phone_number) VALUES (1, '79990001122')",
+    "INSERT INTO wifi_client (id, mac, expiration, employee, phone_id) "
+    "VALUES (1, 'AA:BB:CC:00:11:22', '2024-01-02 12:00:00.000000', 0, 1)",
+]
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'hotspot.db')}")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_upgrade_existing_database(self):
+        with self.engine.begin() as connection:
+            for statement in OLD_SCHEMA:
+                connection.execute(text(statement))
+
+        version = upgrade(self.engine, {'guest': datetime.timedelta(hours=24)})
+        self.assertEqual(version, MIGRATIONS[-1][0])
+
+        inspector = inspect(self.engine)
+        self.assertTrue({'login_at', 'search_key'} <= {c['name'] for c in inspector.get_columns('wifi_client')})
+        self.assertTrue({
+            'ix_wifi_client_expiration', 'ix_wifi_client_phone_id', 'ix_wifi_client_login_at'
+        } <= {index['name'] for index in inspector.get_indexes('wifi_client')})
+        self.assertEqual(
+            [index['name'] for index in inspector.get_indexes('employee_phone')], ['ix_employee_phone_employee_id']
+        )
+
+        with self.engine.connect() as connection:
+            login_at, search_key = connection.execute(text("SELECT login_at, search_key FROM wifi_client")).one()
+            self.assertEqual(login_at, '2024-01-01 12:00:00.000000')
+            self.assertEqual(search_key, 'aabbcc001122 79990001122')
+            # Полнотекстовый индекс перестроен по заполненным ключам
+            self.assertEqual(connection.execute(
+                text("SELECT rowid FROM wifi_client_search WHERE wifi_client_search MATCH '\"1122\"'")
+            ).scalars().all(), [1])
+
+        # Повторный запуск ничего не меняет
+        self.assertEqual(upgrade(self.engine), version)
+
+    def test_upgrade_new_database(self):
+        db.metadata.create_all(self.engine)
+        self.assertEqual(upgrade(self.engine), MIGRATIONS[-1][0])
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT count(*) FROM schema_version")).scalar(), len(MIGRATIONS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from cachelib import MemcachedCache, RedisCache
+from flask import Flask
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app import otp
+from app.otp import SimpleOTPStore, get_otp_store
+from app.otp.memcached import MemcachedOTPStore
+from extensions import cache
+
+
+class _FakeMemcache:
+    """Минимальный клиент memcached с атомарным incr."""
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def set(self, key, value, time=0):
+        self.data[key] = value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def incr(self, key, delta=1):
+        with self.lock:
+            if key not in self.data:
+                return None
+            self.data[key] += delta
+            return self.data[key]
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class TestOTPStore(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['CACHE_TYPE'] = 'SimpleCache'
+        cache.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def _check_flow(self, store):
+        store.issue('sid', '0123')
+        record = store.get('sid')
+        self.assertEqual((record.code, record.attempts), ('0123', 0))
+
+        self.assertEqual(store.verify('sid', '9999'), otp.BAD)
+        self.assertEqual(store.verify('sid', '0123'), otp.OK)
+        self.assertEqual(store.get('sid').attempts, 2)
+
+        self.assertEqual(store.verify('sid', '9999'), otp.EXHAUSTED)
+        self.assertEqual(store.verify('sid', '0123'), otp.EXHAUSTED)
+
+        store.clear('sid')
+        self.assertIsNone(store.get('sid'))
+        self.assertEqual(store.verify('sid', '0123'), otp.EXPIRED)
+
+    def test_cachelib_private_api(self):
+        # Хранилища memcached и redis ходят в клиент cachelib напрямую: при обновлении cachelib
+        # (закреплен в requirements.txt) этот тест должен упасть раньше, чем продакшен
+        memcached = MemcachedCache(servers=_FakeMemcache(), key_prefix='hotspot:')
+        with memcached._client_context() as client:
+            self.assertIsInstance(client, _FakeMemcache)
+        self.assertEqual(memcached._normalize_key('sid:sms:otp'), 'hotspot:sid:sms:otp')
+
+        redis_client = MagicMock()
+        redis = RedisCache(host=redis_client, key_prefix='hotspot:')
+        self.assertIs(redis._write_client, redis_client)
+        self.assertEqual(redis._get_prefix(), 'hotspot:')
+
+    def test_factory(self):
+        store = get_otp_store()
+        self.assertIsInstance(store, SimpleOTPStore)
+        self.assertIs(get_otp_store(), store)
+
+    def test_simple_store(self):
+        self._check_flow(get_otp_store())
+
+    def test_simple_store_attempts_keep_expiry(self):
+        store = get_otp_store()
+        now = 1_800_000_000
+        with patch('app.otp.time.time', return_value=now), patch('cachelib.simple.time', return_value=now):
+            store.issue('sid', '1234')
+        # Попытка незадолго до истечения не продлевает жизнь кода
+        with patch('app.otp.time.time', return_value=now + 290), patch('cachelib.simple.time', return_value=now + 290):
+            self.assertEqual(store.verify('sid', '0000'), otp.BAD)
+        with patch('app.otp.time.time', return_value=now + 301), patch('cachelib.simple.time', return_value=now + 301):
+            self.assertIsNone(store.get('sid'))
+            self.assertEqual(store.verify('sid', '1234'), otp.EXPIRED)
+
+    def test_simple_store_resend_keeps_expiry(self):
+        store = get_otp_store()
+        now = 1_800_000_000
+        with patch('app.otp.time.time', return_value=now), patch('cachelib.simple.time', return_value=now):
+            store.issue('sid', '1234')
+            self.assertEqual(store.verify('sid', '0000'), otp.BAD)
+        # Повторная отправка того же кода не продлевает его жизнь
+        with patch('app.otp.time.time', return_value=now + 290), patch('cachelib.simple.time', return_value=now + 290):
+            self.assertTrue(store.resend('sid'))
+            record = store.get('sid')
+            self.assertEqual((record.code, record.attempts, record.resend_at), ('1234', 1, now + 350))
+        with patch('app.otp.time.time', return_value=now + 301), patch('cachelib.simple.time', return_value=now + 301):
+            self.assertIsNone(store.get('sid'))
+            self.assertFalse(store.resend('sid'))
+
+    def test_memcached_resend(self):
+        client = _FakeMemcache()
+        store = MemcachedOTPStore(MemcachedCache(servers=client, key_prefix='hotspot:'))
+        self.assertFalse(store.resend('sid'))
+        now = 1_800_000_000
+        with patch('app.otp.time.time', return_value=now):
+            store.issue('sid', '0123', attempts=1)
+        # incr вместо set: memcached сохраняет TTL записи
+        with patch('app.otp.time.time', return_value=now + 100), patch.object(client, 'set') as set_value:
+            self.assertTrue(store.resend('sid'))
+            set_value.assert_not_called()
+        self.assertEqual(store.get('sid'), otp.OTPRecord('0123', 1, now + 160))
+
+    def test_memcached_store(self):
+        store = MemcachedOTPStore(MemcachedCache(servers=_FakeMemcache(), key_prefix='hotspot:'))
+        self._check_flow(store)
+        store.issue('sid', '4321', attempts=2, resend_delay=0)
+        self.assertEqual(store.get('sid').code, '4321')
+        self.assertEqual(store.get('sid').attempts, 2)
+
+    def test_concurrent_attempts(self):
+        for store in (get_otp_store(), MemcachedOTPStore(MemcachedCache(servers=_FakeMemcache()))):
+            store.issue('sid', '1234')
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(store.verify('sid', '0000'))) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # Не больше max_attempts попыток, даже если запросы пришли одновременно
+            self.assertEqual(results.count(otp.BAD), 2)
+            self.assertEqual(store.verify('sid', '1234'), otp.EXHAUSTED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import datetime
+import gzip
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.database import db
+from app.database.models import ClientsNumber, SmsOutbox, WifiClient
+from app.database.purge import Purger, in_window, purge_command
+
+
+class TestPurge(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['PURGE'] = {'retention': datetime.timedelta(days=30), 'pause': 0}
+        self.app.cli.add_command(purge_command)
+
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.now = datetime.datetime.now()
+        old = self.now - datetime.timedelta(days=40)
+        for i in range(5):
+            phone = ClientsNumber(phone_number=f'7999000000{i}', last_seen=old)
+            # Первые три клиента истекли давно, остальные еще хранятся
+            expiration = old if i < 3 else self.now - datetime.timedelta(days=1)
+            db.session.add(WifiClient(mac=f'AA:BB:CC:00:00:0{i}', expiration=expiration, phone=phone))
+        db.session.add(ClientsNumber(phone_number='79990000009', last_seen=self.now))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_purge_in_batches(self):
+        report = Purger(datetime.timedelta(days=30), batch_size=2, pause=0).run(now=self.now)
+        self.assertEqual(report, {'wifi_client': 3, 'clients_number': 3, 'sms_outbox': 0, 'complete': True})
+        self.assertEqual(
+            sorted(db.session.scalars(db.select(WifiClient.mac))),
+            ['AA:BB:CC:00:00:03', 'AA:BB:CC:00:00:04']
+        )
+        self.assertEqual(
+            sorted(db.session.scalars(db.select(ClientsNumber.phone_number))),
+            ['79990000003', '79990000004', '79990000009']
+        )
+
+    def test_archive(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            Purger(datetime.timedelta(days=30), pause=0, archive_dir=archive_dir).run(now=self.now)
+            [name] = os.listdir(archive_dir)
+            with gzip.open(os.path.join(archive_dir, name), 'rt') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual([row['table'] for row in rows], ['wifi_client'] * 3 + ['clients_number'] * 3)
+        self.assertEqual(rows[0]['mac'], 'AA:BB:CC:00:00:00')
+        self.assertEqual(rows[0]['phone'], '79990000000')
+
+    def test_sms_outbox_retention(self):
+        old = self.now - datetime.timedelta(days=2)
+        for status, created_at in (('sent', old), ('failed', old), ('pending', old), ('sent', self.now)):
+            db.session.add(SmsOutbox(
+                recipient='79990000001', message='[redacted]', status=status, attempts=1,
+                next_attempt_at=created_at, created_at=created_at
+            ))
+        db.session.commit()
+
+        report = Purger(datetime.timedelta(days=30), outbox_retention=datetime.timedelta(days=1), pause=0).run(now=self.now)
+        self.assertEqual(report['sms_outbox'], 2)
+        # Ожидающее отправки сообщение остается при любом возрасте
+        self.assertEqual(sorted(db.session.scalars(db.select(SmsOutbox.status))), ['pending', 'sent'])
+
+    def test_window(self):
+        self.assertTrue(in_window('22:00-06:00', datetime.datetime(2024, 1, 1, 23, 30)))
+        self.assertTrue(in_window('22:00-06:00', datetime.datetime(2024, 1, 1, 5, 59)))
+        self.assertFalse(in_window('22:00-06:00', datetime.datetime(2024, 1, 1, 12, 0)))
+        self.assertTrue(in_window('01:00-05:00', datetime.datetime(2024, 1, 1, 1, 0)))
+        self.assertTrue(in_window(None))
+
+        with patch('app.database.purge.in_window', return_value=False):
+            report = Purger(datetime.timedelta(days=30), window='22:00-06:00').run(now=self.now)
+        self.assertEqual(report, {'wifi_client': 0, 'clients_number': 0, 'sms_outbox': 0, 'complete': False})
+        self.assertEqual(db.session.scalar(db.select(db.func.count(WifiClient.id))), 5)
+
+    def test_command(self):
+        result = self.app.test_cli_runner().invoke(args=['purge'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Removed 3 wifi clients, 3 phone numbers and 0 outbox messages', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.database import db
+from app.database.models import Blacklist
+from app.database.replica import REPLICA_BIND, measure_replica_lag
+from app.pages.admin import admin_bp
+from extensions import cache
+
+
+class TestReplicaRouting(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.register_blueprint(admin_bp)
+        self.app.config['SECRET_KEY'] = 'secret'
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.tmp.name, 'primary.db')}"
+        self.app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: f"sqlite:///{os.path.join(self.tmp.name, 'replica.db')}"}
+        self.app.config['CACHE_TYPE'] = 'SimpleCache'
+        self.app.config['DB'] = {'replica_max_lag': 10, 'replica_lag_check': 5}
+
+        db.init_app(self.app)
+        cache.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        # Реплика отличается от основной базы, чтобы было видно, откуда пришли данные
+        db.create_all()
+        db.metadata.create_all(db.engines[REPLICA_BIND])
+        db.session.add(Blacklist(phone_number='79990000001'))
+        db.session.commit()
+        with db.engines[REPLICA_BIND].begin() as connection:
+            connection.execute(Blacklist.__table__.insert().values(phone_number='79990000002'))
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['is_authenticated'] = True
+
+    def tearDown(self):
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        # init_app добавляет метаданные привязки в общий db - убираем их для других тестов
+        db.metadatas.pop(REPLICA_BIND, None)
+        self.app_context.pop()
+        self.tmp.cleanup()
+
+    def _blacklist(self):
+        return self.client.get('/admin/table/blacklist').json['data']
+
+    def test_reads_go_to_replica(self):
+        with patch('app.database.replica.measure_replica_lag', wraps=measure_replica_lag) as measure:
+            self.assertEqual(self._blacklist(), ['79990000002'])
+            self.assertEqual(self.client.get('/admin/export/blacklist').data.decode().splitlines(),
+                             ['phone', '79990000002'])
+        # Отставание проверяется раз в replica_lag_check секунд
+        measure.assert_called_once()
+
+    def test_lagging_replica_is_skipped(self):
+        with patch('app.database.replica.measure_replica_lag', return_value=60.0):
+            self.assertEqual(self._blacklist(), ['79990000001'])
+
+    def test_unavailable_replica_is_skipped(self):
+        with patch('app.database.replica.measure_replica_lag', return_value=None):
+            self.assertEqual(self._blacklist(), ['79990000001'])
+
+
+if __name__ == '__main__':
+    unittest.main()
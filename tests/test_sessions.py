@@ -0,0 +1,109 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, session
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from extensions import cache
+from sessions import CacheSessionInterface, KEY_PREFIX, regenerate_session
+from settings import Config
+
+
+class TestCacheSession(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['CACHE_TYPE'] = 'SimpleCache'
+        self.app.config['OTP_TTL'] = 300
+        self.app.session_interface = CacheSessionInterface()
+        cache.init_app(self.app)
+
+        @self.app.route('/set/<key>/<value>')
+        def set_value(key, value):
+            session[key] = value
+            return 'ok'
+
+        @self.app.route('/get/<key>')
+        def get_value(key):
+            return session.get(key, '')
+
+        @self.app.route('/login')
+        def login():
+            regenerate_session(session)
+            session['is_authenticated'] = True
+            return 'ok'
+
+        @self.app.route('/clear')
+        def clear():
+            session.clear()
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    def _sid(self):
+        return self.client.get_cookie('session').value
+
+    def test_opaque_cookie(self):
+        self.client.get('/set/phone/79999999999')
+        sid = self._sid()
+        self.assertNotIn('7999', sid)
+        with self.app.app_context():
+            data, _ = cache.get(KEY_PREFIX + sid)
+        self.assertEqual(data, {'phone': '79999999999'})
+        self.assertEqual(self.client.get('/get/phone').data, b'79999999999')
+
+    def test_lazy_write(self):
+        response = self.client.get('/get/phone')
+        self.assertNotIn('Set-Cookie', response.headers)
+
+        self.client.get('/set/phone/79999999999')
+        with patch('sessions.cache.set') as cache_set:
+            response = self.client.get('/get/phone')
+            cache_set.assert_not_called()
+        self.assertNotIn('Set-Cookie', response.headers)
+
+    def test_ttl(self):
+        with patch('sessions.cache.set') as cache_set:
+            self.client.get('/set/phone/79999999999')
+        self.assertEqual(cache_set.call_args.kwargs['timeout'], 300)
+
+    def test_clear_and_forged_id(self):
+        self.client.get('/set/phone/79999999999')
+        sid = self._sid()
+        self.client.get('/clear')
+        with self.app.app_context():
+            self.assertIsNone(cache.get(KEY_PREFIX + sid))
+
+        self.client.set_cookie('session', 'bad key with spaces')
+        self.assertEqual(self.client.get('/get/phone').data, b'')
+
+    def test_new_id_on_login(self):
+        self.client.get('/set/phone/79999999999')
+        planted = self._sid()
+        self.client.get('/login')
+        sid = self._sid()
+        self.assertNotEqual(sid, planted)
+        with self.app.app_context():
+            # Старый id больше не ведет к сессии
+            self.assertIsNone(cache.get(KEY_PREFIX + planted))
+            data, _ = cache.get(KEY_PREFIX + sid)
+        self.assertEqual(data, {'phone': '79999999999', 'is_authenticated': True})
+
+        self.client.set_cookie('session', planted)
+        self.assertEqual(self.client.get('/get/is_authenticated').data, b'')
+
+
+class TestSessionStoreSetting(unittest.TestCase):
+    @patch.object(Config, 'settings', {'session_store': 'cache'}, create=True)
+    def test_process_local_cache_falls_back_to_cookie(self):
+        with patch.object(Config, 'CACHE_TYPE', 'SimpleCache'), self.assertLogs(level='WARNING'):
+            self.assertEqual(Config.configure_session_store(), 'cookie')
+        with patch.object(Config, 'CACHE_TYPE', 'memcached'):
+            self.assertEqual(Config.configure_session_store(), 'cache')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Add the root directory of the project to the sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+from app.database import db
+from app.database.sqlite import commit_with_retry, setup_sqlite, sqlite_pragmas
+from settings import Config
+
+
+def _locked():
+    return OperationalError('INSERT', {}, Exception('database is locked'))
+
+
+class TestSqliteMode(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.tmp.name, 'hotspot.db')}"
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        self.tmp.cleanup()
+
+    def _pragma(self, name):
+        return db.session.execute(text(f'PRAGMA {name}')).scalar()
+
+    def test_wal_mode(self):
+        setup_sqlite(db.engine, {'sqlite_mode': 'wal', 'busy_timeout': 1234})
+        self.assertEqual(self._pragma('journal_mode'), 'wal')
+        self.assertEqual(self._pragma('busy_timeout'), 1234)
+        self.assertEqual(self._pragma('synchronous'), 1)
+        self.assertEqual(self._pragma('cache_size'), -64 * 1024)
+
+    @patch.dict(os.environ, {'HOTSPOT_DB_MMAP_SIZE': '0', 'HOTSPOT_DB_CACHE_SIZE': '2048', 'HOTSPOT_DB_BUSY_TIMEOUT': '0'})
+    @patch.object(Config, 'settings', {'db': {'mmap_size': 1024, 'cache_size': 4096}}, create=True)
+    def test_size_env_overrides(self):
+        db_config = Config.configure_db()
+        self.assertEqual((db_config['busy_timeout'], db_config['mmap_size'], db_config['cache_size']), (0, 0, 2048))
+        setup_sqlite(db.engine, db_config)
+        self.assertEqual(self._pragma('cache_size'), -2048)
+        self.assertEqual(self._pragma('busy_timeout'), 0)
+
+    def test_off_mode(self):
+        self.assertEqual(sqlite_pragmas({'sqlite_mode': 'off'}), {})
+        setup_sqlite(db.engine, {'sqlite_mode': 'off'})
+        self.assertEqual(self._pragma('journal_mode'), 'delete')
+
+    @patch('app.database.sqlite.time.sleep')
+    def test_commit_retry(self, sleep):
+        work = MagicMock(side_effect=[_locked(), _locked(), 'done'])
+        self.assertEqual(commit_with_retry(work), 'done')
+        self.assertEqual(work.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+        work = MagicMock(side_effect=_locked())
+        with self.assertRaises(OperationalError):
+            commit_with_retry(work, attempts=2)
+        self.assertEqual(work.call_count, 2)
+
+        # Другие ошибки не повторяются
+        work = MagicMock(side_effect=OperationalError('SELECT', {}, Exception('no such table: x')))
+        with self.assertRaises(OperationalError):
+            commit_with_retry(work)
+        work.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()